@@ -1,19 +1,100 @@
-import streamlit as st
 import os
-import tempfile
+import streamlit as st
 from document_processor import DocumentProcessor
 from translator import Translator
 from legal_analyzer import LegalAnalyzer
-from model_manager import ModelManager
+from model_manager import get_model_manager
+from pipeline import DocumentPipeline
+from job_queue import JobQueue, job_progress
+from telemetry import start_metrics_server
+from text_viewer import PagedText
+
+@st.cache_resource(show_spinner=False)
+def load_components():
+    """Build the pipeline components once per process instead of on every rerun"""
+    return get_model_manager(), DocumentProcessor(), Translator(), LegalAnalyzer()
+
+@st.cache_resource(show_spinner=False)
+def load_job_queue():
+    """Start the background analysis workers once per process"""
+    return JobQueue(DocumentPipeline(document_processor, translator, legal_analyzer))
+
+@st.cache_resource(show_spinner=False)
+def load_metrics_server():
+    """Serve Prometheus metrics once per process; METRICS_PORT=0 turns the endpoint off"""
+    return start_metrics_server()
+
+@st.fragment(run_every=1)
+def show_job_progress(job_id):
+    """Redraw a running job's progress and the analysis written so far every second, then rerun the page to show its result"""
+    job = job_queue.get(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    fraction, label = job_progress(job)
+    st.progress(fraction, text=label)
+    if job["partial"]:
+        # The worker streams the analysis, translated paragraph by paragraph if needed, into the job
+        st.markdown("## Legal Analysis")
+        st.markdown(job["partial"])
+
+def go_to_window(viewer_key, viewer, window):
+    """Move the text viewer to a window, keeping its page box in step"""
+    window = max(0, min(window, viewer.window_count - 1))
+    st.session_state[f"{viewer_key}_window"] = window
+    st.session_state[f"{viewer_key}_page"] = viewer.page_of(window)
 
-# Create temp directory if it doesn't exist
-os.makedirs("temp", exist_ok=True)
+@st.fragment
+def show_extracted_text(viewer, viewer_key, unit):
+    """Show one window of the extracted text; paging and searching rerun only the viewer"""
+    page_key = f"{viewer_key}_page"
+    window = min(st.session_state.get(f"{viewer_key}_window", 0), viewer.window_count - 1)
+
+    search_column, page_column = st.columns([3, 1])
+    query = search_column.text_input("Search the text", key=f"{viewer_key}_query")
+    page_column.number_input(
+        f"{unit} (of {viewer.page_count})", min_value=1, max_value=viewer.page_count, key=page_key,
+        on_change=lambda: go_to_window(viewer_key, viewer, viewer.first_window(st.session_state[page_key]))
+    )
+
+    matches, total = viewer.search(query)
+    if matches:
+        # A new query gets a new list, so the previous selection does not carry over
+        match_key = f"{viewer_key}_match_{query.strip()}"
+        shown = f", showing the first {len(matches)}" if total > len(matches) else ""
+
+        def jump_to_match():
+            selected = st.session_state[match_key]
+            if selected is not None:
+                go_to_window(viewer_key, viewer, matches[selected]["window"])
+
+        st.selectbox(
+            f"{total} {'match' if total == 1 else 'matches'}{shown}", options=range(len(matches)), index=None, placeholder="Jump to a match",
+            format_func=lambda i: f"{unit} {matches[i]['page']}, line {matches[i]['line']}: ...{matches[i]['snippet']}...",
+            key=match_key, on_change=jump_to_match
+        )
+    elif query.strip():
+        st.caption(f'No matches for "{query.strip()}"')
+
+    previous_column, position_column, next_column = st.columns([1, 4, 1])
+    previous_column.button(
+        "Previous", key=f"{viewer_key}_previous", disabled=window == 0,
+        on_click=go_to_window, args=(viewer_key, viewer, window - 1)
+    )
+    next_column.button(
+        "Next", key=f"{viewer_key}_next", disabled=window >= viewer.window_count - 1,
+        on_click=go_to_window, args=(viewer_key, viewer, window + 1)
+    )
+    part, parts = viewer.window_part(window)
+    start, end = viewer.window_range(window)
+    position = f"{unit} {viewer.page_of(window)} of {viewer.page_count}" + (f", part {part} of {parts}" if parts > 1 else "")
+    position_column.caption(f"{position} · characters {start:,} to {end:,} of {len(viewer.text):,}")
+    # Only the visible window is sent to the browser, however long the document
+    st.text(viewer.window_text(window))
 
 # Initialize components
-model_manager = ModelManager()
-document_processor = DocumentProcessor()
-translator = Translator()
-legal_analyzer = LegalAnalyzer()
+model_manager, document_processor, translator, legal_analyzer = load_components()
+job_queue = load_job_queue()
+load_metrics_server()
 
 # Set page config
 st.set_page_config(
@@ -41,24 +122,59 @@ selected_model = st.sidebar.selectbox(
 
 st.sidebar.info(f"Using {selected_model} for analysis")
 
+# Direct mode reads the document and writes the analysis in the chosen languages in one
+# call; the default translates to English, analyzes, then translates the analysis back
+analysis_modes = ["Translate via English", "Direct (single pass)"]
+analysis_mode = st.sidebar.radio(
+    "Analysis mode",
+    options=analysis_modes,
+    index=1 if os.getenv("ANALYSIS_MODE", "translate").lower() == "direct" else 0
+)
+direct_mode = analysis_mode == analysis_modes[1]
+
+# Where the time went for each document: stages, model calls, tokens and cache hits
+show_trace = st.sidebar.checkbox(
+    "Show processing trace",
+    value=os.getenv("SHOW_TRACE", "").lower() in ("1", "true", "yes")
+)
+
 # File uploader
 uploaded_file = st.file_uploader("Upload your legal document", 
                                 type=["pdf", "docx", "jpg", "jpeg", "png"])
 
 if uploaded_file is not None:
-    # Save the uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
-        tmp_file.write(uploaded_file.getbuffer())
-        file_path = tmp_file.name
-    
     # Process the document
     with st.spinner("Extracting text from document..."):
         try:
-            extracted_text, detected_lang = document_processor.extract_text_and_detect_language(file_path, selected_model)
+            # Large PDFs report progress page by page
+            extract_progress = st.empty()
+            def show_extract_progress(done, total):
+                if total > 1:
+                    extract_progress.progress(done / total, text=f"Extracted page {done} of {total}")
+            
+            cleanup = {}
+            extracted_text, detected_lang = document_processor.extract_text_and_detect_language(
+                uploaded_file, selected_model, on_page=show_extract_progress, on_cleanup=cleanup.update,
+                file_name=uploaded_file.name
+            )
+            extract_progress.empty()
             
-            # Show extracted text in a collapsible section
+            if cleanup.get("chars_saved"):
+                st.caption(
+                    f"Removed {cleanup['lines_removed']} repeated header, footer and page number lines, "
+                    f"saving {cleanup['chars_saved']} characters (~{cleanup['tokens_saved']} tokens)"
+                )
+            
+            # Show extracted text in a collapsible section, a page at a time. The index
+            # is built once per document and kept across reruns
+            viewer = st.session_state.get("text_viewer")
+            if viewer is None or viewer.text != extracted_text:
+                viewer = st.session_state["text_viewer"] = PagedText(extracted_text, cleanup.get("page_starts"))
             with st.expander("View Extracted Text"):
-                st.text(extracted_text)
+                show_extracted_text(
+                    viewer, f"viewer_{uploaded_file.name}_{uploaded_file.size}",
+                    "Page" if uploaded_file.name.lower().endswith(".pdf") else "Section"
+                )
             
             # Map language codes to names for display
             language_names = {
@@ -89,56 +205,60 @@ if uploaded_file is not None:
             # Map language names back to codes
             target_lang_code = {v: k for k, v in language_names.items()}.get(target_language)
             
-            # Analyze the legal document
+            # Analyze the legal document on a background worker, so the analysis survives
+            # reruns and identical requests share one run
+            jobs = st.session_state.setdefault("analysis_jobs", {})
+            job_options = (uploaded_file.name, uploaded_file.size, selected_model, target_lang_code, direct_mode)
             if st.button("Analyze Document"):
-                with st.spinner("Analyzing the legal document..."):
-                    # Translate to English if needed for analysis
-                    if detected_lang != "en":
-                        with st.spinner("Translating document to English for analysis..."):
-                            english_text = translator.translate_to_english(extracted_text, detected_lang, selected_model)
-                    else:
-                        english_text = extracted_text
-                    
-                    # Add this after extracting text and detecting language
-                    print(f"Extracted text length: {len(extracted_text)}")
-                    print(f"Detected language: {detected_lang}")
-                    
-                    # Add this before analyzing the document
-                    print(f"Text length for analysis: {len(english_text)}")
-                    # Analyze the document
-                    analysis = legal_analyzer.analyze_legal_document(english_text, selected_model)
-                    
-                    # Translate analysis to target language if needed
-                    if target_lang_code != "en":
-                        with st.spinner(f"Translating analysis to {target_language}..."):
-                            final_output = translator.translate_to_language(analysis, "en", target_lang_code, selected_model)
-                    else:
-                        final_output = analysis
-                    
-                    # Display the analysis
-                    st.markdown("## Legal Analysis")
-                    st.markdown(final_output)
+                jobs[job_options] = job_queue.submit(
+                    uploaded_file, uploaded_file.name, selected_model, target_lang_code, direct_mode
+                )
+                print(f"Extracted text length: {len(extracted_text)}")
+                print(f"Detected language: {detected_lang}")
+            
+            job = job_queue.get(jobs[job_options]) if job_options in jobs else None
+            if job is not None and job["status"] in ("queued", "running"):
+                show_job_progress(job["id"])
+            elif job is not None and job["status"] != "done":
+                reason = job["error"] or "the app restarted before it finished"
+                st.error(f"Analysis {job['status']}: {reason}. Click Analyze Document to try again.")
+            elif job is not None:
+                result = job["result"]
+                st.markdown("## Legal Analysis")
+                st.markdown(result["output"])
+                analysis = result["analysis"]
+                
+                # Extract win probability if available
+                try:
+                    import re
+                    win_prob_match = re.search(r'(\d+)%', analysis)
+                    if win_prob_match:
+                        win_prob = int(win_prob_match.group(1))
+                        st.subheader("Case Win Probability")
+                        st.progress(win_prob/100)
+                        st.metric("Estimated Chance of Success", f"{win_prob}%")
+                except:
+                    pass
+                
+                trace = result.get("trace")
+                if show_trace and trace:
+                    with st.expander(f"Processing trace ({trace['seconds']:.1f}s)"):
+                        st.markdown("**Time per stage**")
+                        st.table([
+                            {"stage": name, "spans": stage["spans"], "seconds": stage["seconds"]}
+                            for name, stage in sorted(trace["stages"].items(), key=lambda item: -item[1]["seconds"])
+                        ])
+                        if trace["counts"]:
+                            st.markdown("**Tokens, bytes, cache and retries**")
+                            st.table([{"count": name, "value": value} for name, value in sorted(trace["counts"].items())])
+                        st.markdown("**Spans**")
+                        if trace.get("dropped_spans"):
+                            st.caption(f"Showing the slowest {len(trace['spans'])} of {len(trace['spans']) + trace['dropped_spans']} spans")
+                        st.dataframe(trace["spans"], use_container_width=True)
                     
-                    # Extract win probability if available
-                    try:
-                        import re
-                        win_prob_match = re.search(r'(\d+)%', analysis)
-                        if win_prob_match:
-                            win_prob = int(win_prob_match.group(1))
-                            st.subheader("Case Win Probability")
-                            st.progress(win_prob/100)
-                            st.metric("Estimated Chance of Success", f"{win_prob}%")
-                    except:
-                        pass
-                        
         except Exception as e:
             st.error(f"Error processing document: {str(e)}")
-            
-        # Clean up
-        try:
-            os.remove(file_path)
-        except:
-            pass
+
 
 # Footer
 st.markdown("---")
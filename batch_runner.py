@@ -0,0 +1,202 @@
+"""Headless batch processing of legal documents.
+
+Example:
+    python batch_runner.py cases/ --output results.jsonl --workers 8 --target-lang hi
+
+Results are appended to the output JSONL file one line per document as they
+finish, so an interrupted run can be restarted with the same command and only
+the documents without a successful result are processed again.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from document_processor import SUPPORTED_EXTENSIONS
+from utils import estimate_tokens
+
+# Components are built lazily, once per worker process
+_components = None
+_components_lock = threading.Lock()
+
+
+def _get_components():
+    """Return the (processor, translator, analyzer) shared by this process's workers"""
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                from document_processor import DocumentProcessor
+                from translator import Translator
+                from legal_analyzer import LegalAnalyzer
+                _components = (DocumentProcessor(), Translator(), LegalAnalyzer())
+    return _components
+
+
+def process_file(path, selected_model, target_lang, include_text=False, direct=False):
+    """Run the full pipeline on one document and return its result record"""
+    document_processor, translator, legal_analyzer = _get_components()
+    started = time.time()
+    record = {"path": path, "model": selected_model, "target_lang": target_lang, "mode": "direct" if direct else "translate"}
+
+    try:
+        cleanup = {}
+        text, lang = document_processor.extract_text_and_detect_language(path, selected_model, on_cleanup=cleanup.update)
+        if direct:
+            # One call reads the original language and writes the target language
+            analysis = legal_analyzer.analyze_legal_document(text, selected_model, lang, target_lang)
+            if analysis.startswith("Error analyzing document"):
+                raise RuntimeError(analysis)
+            output = analysis
+            tokens = estimate_tokens(text) + estimate_tokens(analysis)
+        else:
+            english_text = translator.translate_to_english(text, lang, selected_model) if lang != "en" else text
+            analysis = legal_analyzer.analyze_legal_document(english_text, selected_model)
+            if analysis.startswith("Error analyzing document"):
+                raise RuntimeError(analysis)
+            output = translator.translate_to_language(analysis, "en", target_lang, selected_model) if target_lang != "en" else analysis
+
+            # Estimated tokens sent to and received from the models for this document
+            tokens = estimate_tokens(text) + estimate_tokens(analysis)
+            if lang != "en":
+                tokens += estimate_tokens(english_text) * 2
+            if target_lang != "en":
+                tokens += estimate_tokens(output)
+
+        record.update({
+            "status": "ok",
+            "language": lang,
+            "text_chars": len(text),
+            "tokens_saved_by_cleanup": cleanup.get("tokens_saved", 0),
+            "analysis": analysis,
+            "output": output,
+            "tokens_estimate": tokens,
+        })
+        if include_text:
+            record["text"] = text
+    except Exception as e:
+        record.update({"status": "error", "error": str(e)})
+
+    record["seconds"] = round(time.time() - started, 3)
+    return record
+
+
+def collect_inputs(source, recursive=True):
+    """Return document paths from a directory, or from a manifest of paths (plain text or JSONL)"""
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    paths.append(os.path.join(root, name))
+            if not recursive:
+                break
+        return paths
+
+    # Manifest entries are relative to the manifest's own directory
+    base = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["path"]
+            paths.append(line if os.path.isabs(line) else os.path.join(base, line))
+    return paths
+
+
+def load_checkpoint(output_path):
+    """Return the paths that already have a successful result in the output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut off by an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["path"])
+    return done
+
+
+def run_batch(paths, output_path, selected_model, target_lang, workers=4, use_processes=False, include_text=False,
+              direct=False):
+    """Process documents concurrently, appending each result to the output file; returns a summary"""
+    done = load_checkpoint(output_path)
+    pending = [path for path in paths if path not in done]
+    print(f"{len(paths)} documents, {len(done)} already done, {len(pending)} to process")
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    summary = {"processed": 0, "failed": 0, "tokens": 0, "skipped": len(paths) - len(pending)}
+    started = time.time()
+
+    with open(output_path, "a", encoding="utf-8") as out, executor_class(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_file, path, selected_model, target_lang, include_text, direct): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:
+                # A crashed worker process still gets a failure record
+                record = {"path": futures[future], "status": "error", "error": str(e)}
+
+            # Flush each line so an interruption never loses finished work
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+            summary["processed"] += 1
+            if record["status"] != "ok":
+                summary["failed"] += 1
+                print(f"Failed: {record['path']}: {record.get('error')}")
+            summary["tokens"] += record.get("tokens_estimate", 0)
+            print(f"[{summary['processed']}/{len(pending)}] {record['path']} ({record['status']})")
+
+    elapsed = time.time() - started
+    minutes = max(elapsed, 1e-9) / 60
+    summary.update({
+        "seconds": round(elapsed, 2),
+        "docs_per_minute": round((summary["processed"] - summary["failed"]) / minutes, 2),
+        "tokens_per_minute": round(summary["tokens"] / minutes, 1),
+    })
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process a directory or manifest of legal documents without the UI")
+    parser.add_argument("source", help="Directory of documents, or a manifest file listing one path per line (or JSONL with a 'path' field)")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file results are appended to (default: results.jsonl)")
+    parser.add_argument("-m", "--model", default="OpenAI (GPT-3.5)", help="Model name as shown in the app (default: OpenAI (GPT-3.5))")
+    parser.add_argument("-t", "--target-lang", default="en", help="Language code for the final explanation (default: en)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Documents processed concurrently (default: 4)")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of threads")
+    parser.add_argument("--no-recursive", action="store_true", help="Do not descend into subdirectories")
+    parser.add_argument("--include-text", action="store_true", help="Include the extracted text in each result")
+    parser.add_argument("--direct", action="store_true", help="Analyze in the document's own language in one call, without translating")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.source, recursive=not args.no_recursive)
+    summary = run_batch(
+        paths, args.output, args.model, args.target_lang,
+        workers=args.workers, use_processes=args.processes, include_text=args.include_text,
+        direct=args.direct
+    )
+
+    print(
+        f"Processed {summary['processed']} documents in {summary['seconds']}s "
+        f"({summary['skipped']} skipped, {summary['failed']} failed)\n"
+        f"Throughput: {summary['docs_per_minute']} docs/min, {summary['tokens_per_minute']} est. tokens/min"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,294 @@
+"""Offline benchmark of extraction, translation and analysis against a local stand-in LLM server.
+
+Example:
+    python benchmark.py --concurrency 1,4,8 --requests 16 --latency 0.3 --token-rate 80 --output bench.json
+    python benchmark.py --baseline bench.json --output bench_new.json
+
+No API keys are needed: a fake OpenAI and Gemini server (fake_llm_server.py)
+is started in-process with the given latency, token rate and error rates, and
+the providers' clients are pointed at it. A synthetic multilingual corpus
+(synthetic_corpus.py) is generated unless --corpus names one. The result cache
+and translation memory are turned off so every request does the full work.
+
+For each operation (extract_text_and_detect_language, Translator,
+LegalAnalyzer) and concurrency level the report records latency percentiles,
+throughput, errors, retries and the server's request and token counts. With
+--baseline, p95 latency and throughput are compared against an earlier report
+and the exit status is non-zero if either regressed beyond --tolerance.
+"""
+import os
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from statistics import mean
+from concurrent.futures import ThreadPoolExecutor
+from fake_llm_server import FakeLLMServer
+from synthetic_corpus import build_corpus
+from telemetry import tracing
+
+OPERATIONS = ["extract", "translate", "analyze"]
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies, wall_seconds, errors):
+    """Return latency percentiles and throughput for one benchmark run"""
+    ordered = sorted(latencies)
+    stats = {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_per_second": round(len(latencies) / wall_seconds, 3) if wall_seconds else None,
+        "mean_seconds": round(mean(ordered), 4) if ordered else None,
+        "min_seconds": round(ordered[0], 4) if ordered else None,
+        "max_seconds": round(ordered[-1], 4) if ordered else None,
+    }
+    for percent in PERCENTILES:
+        value = percentile(ordered, percent)
+        stats[f"p{percent}_seconds"] = round(value, 4) if value is not None else None
+    return stats
+
+
+def point_at_server(server):
+    """Send both providers' requests to the fake server and turn off caching; call before building components"""
+    os.environ.update({
+        "OPENAI_BASE_URL": server.openai_base_url,
+        "OPENAI_API_KEY": "fake-key",
+        "GEMINI_API_ENDPOINT": server.gemini_endpoint,
+        "GEMINI_API_KEY": "fake-key",
+        "RESULT_CACHE_DISABLED": "1",
+        "TRANSLATION_MEMORY_DISABLED": "1",
+    })
+
+
+def gave_up(trace):
+    """Whether a request's model calls failed beyond what retries and failover made up for"""
+    trace = trace.to_dict()
+    errors = sum(1 for span in trace["spans"] if span["name"] == "model_call" and span.get("outcome") == "error")
+    recovered = sum(
+        value for name, value in trace["counts"].items()
+        if name.startswith(("model_retries_total", "model_failovers_total"))
+    )
+    return errors > recovered
+
+
+def translate_or_fail(translator, text, lang, selected_model):
+    """Translate text to English, raising if it comes back unchanged as the translator does on failure"""
+    translated = translator.translate_to_english(text, lang, selected_model)
+    if translated == text:
+        raise RuntimeError("translation returned the source text")
+    return translated
+
+
+def build_workloads(components, manifest, selected_model):
+    """Extract the corpus once; returns {operation: [callable, ...]} of the work to time"""
+    document_processor, translator, legal_analyzer = components
+    extracted = []
+    for entry in manifest:
+        text, lang = document_processor.extract_text_and_detect_language(entry["path"], selected_model)
+        extracted.append((entry, text, lang))
+
+    workloads = {
+        "extract": [
+            lambda path=entry["path"]: document_processor.extract_text_and_detect_language(path, selected_model)
+            for entry in manifest
+        ],
+        "translate": [
+            lambda text=text, lang=lang: translate_or_fail(translator, text, lang, selected_model)
+            for entry, text, lang in extracted if lang != "en" and text
+        ],
+        "analyze": [
+            lambda text=text: legal_analyzer.analyze_legal_document(text, selected_model)
+            for entry, text, lang in extracted if lang == "en" and text
+        ],
+    }
+    return workloads
+
+
+def run_level(work, requests, concurrency):
+    """Run requests calls drawn round-robin from work on concurrency threads; returns (latencies, errors, seconds)"""
+    calls = [work[i % len(work)] for i in range(requests)]
+
+    def timed(call):
+        started = time.perf_counter()
+        # Each request gets its own trace, so calls that gave up are not confused across threads
+        with tracing() as trace:
+            result = call()
+        # The components report failures in their return values, or fall back to partial results,
+        # rather than raising
+        failed = (isinstance(result, str) and result.startswith("Error analyzing document")) or gave_up(trace)
+        return time.perf_counter() - started, failed
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed, call) for call in calls]
+        for future in futures:
+            try:
+                seconds, failed = future.result()
+            except Exception as e:
+                print(f"Benchmark request failed: {str(e)}")
+                errors += 1
+                continue
+            if failed:
+                errors += 1
+            else:
+                latencies.append(seconds)
+    return latencies, errors, time.perf_counter() - started
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of regressions in p95 latency or throughput against a baseline report"""
+    regressions = []
+    for operation, levels in results.items():
+        for level, current in levels.items():
+            previous = baseline.get("results", {}).get(operation, {}).get(level)
+            if not previous:
+                continue
+            if current["p95_seconds"] and previous.get("p95_seconds") and \
+                    current["p95_seconds"] > previous["p95_seconds"] * (1 + tolerance):
+                regressions.append({
+                    "operation": operation, "concurrency": int(level), "metric": "p95_seconds",
+                    "baseline": previous["p95_seconds"], "current": current["p95_seconds"],
+                })
+            if current["throughput_per_second"] and previous.get("throughput_per_second") and \
+                    current["throughput_per_second"] < previous["throughput_per_second"] * (1 - tolerance):
+                regressions.append({
+                    "operation": operation, "concurrency": int(level), "metric": "throughput_per_second",
+                    "baseline": previous["throughput_per_second"], "current": current["throughput_per_second"],
+                })
+    return regressions
+
+
+def _git_revision():
+    """Return the current commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against a fake LLM server")
+    parser.add_argument("--corpus", help="Directory with a manifest.json from synthetic_corpus.py (default: generate one)")
+    parser.add_argument("--documents", type=int, default=2, help="Generated PDF and Word documents per language (default: 2)")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per generated document (default: 8)")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for the corpus and the server (default: 7)")
+    parser.add_argument("-m", "--model", default="OpenAI (GPT-3.5)", help="Model name as shown in the app (default: OpenAI (GPT-3.5))")
+    parser.add_argument("--operations", default=",".join(OPERATIONS), help="Comma-separated operations (default: all)")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated concurrency levels (default: 1,4,8)")
+    parser.add_argument("--requests", type=int, default=12, help="Requests per operation and level (default: 12)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Server seconds before the first token (default: 0.2)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Random +/- seconds on the latency (default: 0.05)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Server reply tokens per second (default: 200)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500/503 (default: 0)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that hang (default: 0)")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="How long a hanging request waits (default: 30)")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="JSON report file (default: benchmark.json)")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression as a fraction (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(
+        latency=args.latency, jitter=args.jitter, token_rate=args.token_rate, error_rate=args.error_rate,
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds, seed=args.seed
+    ).start()
+    point_at_server(server)
+
+    # Components read their settings from the environment, so they are built after it is set
+    from document_processor import DocumentProcessor
+    from translator import Translator
+    from legal_analyzer import LegalAnalyzer
+    from telemetry import get_metrics
+
+    with tempfile.TemporaryDirectory() as generated:
+        if args.corpus:
+            with open(os.path.join(args.corpus, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        else:
+            manifest = build_corpus(generated, args.documents, args.pages, args.seed)
+        print(f"Corpus: {len(manifest)} documents; server at {server.openai_base_url}")
+
+        components = (DocumentProcessor(), Translator(), LegalAnalyzer())
+        workloads = build_workloads(components, manifest, args.model)
+        metrics = get_metrics()
+
+        operations = [name.strip() for name in args.operations.split(",") if name.strip()]
+        levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+        results = {}
+        for operation in operations:
+            work = workloads.get(operation)
+            if not work:
+                print(f"Skipping {operation}: nothing in the corpus to run it on")
+                continue
+            results[operation] = {}
+            for concurrency in levels:
+                server_before = dict(server.stats)
+                retries_before = sum(metrics.value("model_retries_total", provider=p) for p in ("openai", "gemini"))
+                latencies, errors, wall_seconds = run_level(work, args.requests, concurrency)
+
+                stats = summarize_latencies(latencies, wall_seconds, errors)
+                stats["retries"] = int(
+                    sum(metrics.value("model_retries_total", provider=p) for p in ("openai", "gemini")) - retries_before
+                )
+                stats["server"] = {key: server.stats[key] - server_before[key] for key in server.stats}
+                results[operation][str(concurrency)] = stats
+                print(
+                    f"{operation:<10} concurrency {concurrency:>3}: p50 {stats['p50_seconds']}s, "
+                    f"p95 {stats['p95_seconds']}s, {stats['throughput_per_second']}/s, {errors} errors"
+                )
+    server.stop()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "model": args.model,
+        "settings": {
+            "requests": args.requests, "latency": args.latency, "jitter": args.jitter,
+            "token_rate": args.token_rate, "error_rate": args.error_rate, "hang_rate": args.hang_rate,
+            "seed": args.seed, "documents": len(manifest),
+        },
+        "results": results,
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["baseline"] = {"file": args.baseline, "revision": baseline.get("revision")}
+        report["regressions"] = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in report["regressions"]:
+            print(
+                f"Regression: {regression['operation']} at concurrency {regression['concurrency']} "
+                f"{regression['metric']} {regression['baseline']} -> {regression['current']}"
+            )
+        if report["regressions"]:
+            status = 1
+        else:
+            print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
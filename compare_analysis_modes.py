@@ -0,0 +1,192 @@
+"""Compare direct single-pass analysis against the translate-analyze-translate path.
+
+Example:
+    python compare_analysis_modes.py cases/ --target-langs hi,ta,en --judge --output comparison.json
+
+Each document is extracted once, then analyzed both ways for every target
+language with the result cache and translation memory turned off, so both
+paths pay for every call. For each run the report records latency, the
+analysis sections present, the win probability, and whether the output is
+in the target script. With --judge it also records a 1-10 quality score from
+the model. The summary per target language says which mode to prefer.
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from statistics import mean
+from batch_runner import collect_inputs
+from legal_analyzer import ANALYSIS_SECTIONS, parse_analysis_sections
+from language_detector import detect_script_language
+from utils import estimate_tokens
+
+JUDGE_PROMPT = """You are reviewing a legal analysis written for a common person in India. You are given the start of the original document and the analysis, which is written in {target}. Score the analysis from 1 to 10 for accuracy against the document, completeness of its four sections (case summary, relevant laws, legal advice, win probability) and fluency in {target}. Reply with the score only."""
+
+# Languages sharing a script cannot be told apart by script alone
+SHARED_SCRIPTS = {"hi": {"hi", "mr"}, "mr": {"hi", "mr"}}
+
+# Direct mode is preferred when it is faster and its quality is at most this much lower
+QUALITY_TOLERANCE = 0.5
+
+
+def _build_components():
+    """Return (processor, translator, analyzer) with caching turned off so every call is timed"""
+    from document_processor import DocumentProcessor
+    from translator import Translator
+    from legal_analyzer import LegalAnalyzer
+    translator = Translator()
+    legal_analyzer = LegalAnalyzer()
+    translator.cache.enabled = False
+    translator.memory.enabled = False
+    legal_analyzer.cache.enabled = False
+    return DocumentProcessor(), translator, legal_analyzer
+
+
+def run_multi_hop(translator, legal_analyzer, text, lang, target_lang, selected_model):
+    """Translate to English, analyze, translate the analysis; returns (output, seconds)"""
+    started = time.time()
+    english_text = translator.translate_to_english(text, lang, selected_model) if lang != "en" else text
+    analysis = legal_analyzer.analyze_legal_document(english_text, selected_model)
+    output = analysis
+    if target_lang != "en" and not analysis.startswith("Error analyzing document"):
+        output = translator.translate_to_language(analysis, "en", target_lang, selected_model)
+    return output, time.time() - started
+
+
+def run_direct(legal_analyzer, text, lang, target_lang, selected_model):
+    """Analyze in one pass from the source language into the target language; returns (output, seconds)"""
+    started = time.time()
+    output = legal_analyzer.analyze_legal_document(text, selected_model, lang, target_lang)
+    return output, time.time() - started
+
+
+def score_output(output, target_lang):
+    """Return structural quality measures of an analysis that need no reference answer"""
+    sections = parse_analysis_sections(output)
+    win_match = re.search(r'(\d+)\s*%', sections.get("📈", ("", output))[1])
+    detected, confidence = detect_script_language(output)
+    return {
+        "error": output.startswith("Error analyzing document"),
+        "sections": sum(1 for emoji, _ in ANALYSIS_SECTIONS if emoji in sections),
+        "win_probability": int(win_match.group(1)) if win_match else None,
+        "detected_language": detected,
+        "in_target_language": detected in SHARED_SCRIPTS.get(target_lang, {target_lang}),
+        "output_tokens": estimate_tokens(output),
+    }
+
+
+def judge_output(model_manager, document_text, output, target_lang, selected_model):
+    """Ask the model for a 1-10 quality score of an analysis; None if it cannot be read"""
+    from translator import LANGUAGE_NAMES
+    target = LANGUAGE_NAMES.get(target_lang, target_lang)
+    content = f"Document (start):\n{document_text[:6000]}\n\nAnalysis:\n{output}"
+    try:
+        reply = model_manager.generate(
+            selected_model, JUDGE_PROMPT.format(target=target), content, temperature=0, max_tokens=5
+        )
+        match = re.search(r'\d+', reply)
+        return min(10, int(match.group())) if match else None
+    except Exception as e:
+        print(f"Judge error: {str(e)}")
+        return None
+
+
+def compare_document(path, components, selected_model, target_langs, judge=False):
+    """Run both modes on one document for each target language; returns a list of records"""
+    document_processor, translator, legal_analyzer = components
+    text, lang = document_processor.extract_text_and_detect_language(path, selected_model)
+    records = []
+    for target_lang in target_langs:
+        record = {"path": path, "source_lang": lang, "target_lang": target_lang, "input_tokens": estimate_tokens(text)}
+        runs = {
+            "multi_hop": run_multi_hop(translator, legal_analyzer, text, lang, target_lang, selected_model),
+            "direct": run_direct(legal_analyzer, text, lang, target_lang, selected_model),
+        }
+        for mode, (output, seconds) in runs.items():
+            result = score_output(output, target_lang)
+            result["seconds"] = round(seconds, 3)
+            if judge and not result["error"]:
+                result["judge_score"] = judge_output(legal_analyzer.model_manager, text, output, target_lang, selected_model)
+            result["output"] = output
+            record[mode] = result
+
+        win_probabilities = [record[mode]["win_probability"] for mode in runs]
+        if None not in win_probabilities:
+            record["win_probability_gap"] = abs(win_probabilities[0] - win_probabilities[1])
+        print(
+            f"{path} {lang}->{target_lang}: multi-hop {record['multi_hop']['seconds']}s, "
+            f"direct {record['direct']['seconds']}s"
+        )
+        records.append(record)
+    return records
+
+
+def summarize(records):
+    """Average latency and quality per target language and recommend a mode for each"""
+    summary = {}
+    for target_lang in sorted({record["target_lang"] for record in records}):
+        rows = [record for record in records if record["target_lang"] == target_lang]
+        entry = {"documents": len(rows)}
+        for mode in ("multi_hop", "direct"):
+            results = [row[mode] for row in rows if not row[mode]["error"]]
+            scores = [r["judge_score"] for r in results if r.get("judge_score") is not None]
+            entry[mode] = {
+                "errors": len(rows) - len(results),
+                "mean_seconds": round(mean(r["seconds"] for r in results), 3) if results else None,
+                "mean_sections": round(mean(r["sections"] for r in results), 2) if results else None,
+                "in_target_language": round(mean(r["in_target_language"] for r in results), 2) if results else None,
+                "mean_judge_score": round(mean(scores), 2) if scores else None,
+            }
+
+        multi_hop, direct = entry["multi_hop"], entry["direct"]
+        # Judge scores when available, otherwise the share of the four sections present
+        quality = "mean_judge_score" if multi_hop["mean_judge_score"] and direct["mean_judge_score"] else "mean_sections"
+        if direct["mean_seconds"] is None or direct[quality] is None:
+            entry["recommended_mode"] = "multi_hop"
+        elif multi_hop["mean_seconds"] is None or multi_hop[quality] is None:
+            entry["recommended_mode"] = "direct"
+        else:
+            good_enough = direct[quality] >= multi_hop[quality] - QUALITY_TOLERANCE
+            faster = direct["mean_seconds"] <= multi_hop["mean_seconds"]
+            entry["recommended_mode"] = "direct" if good_enough and faster else "multi_hop"
+            entry["speedup"] = round(multi_hop["mean_seconds"] / max(direct["mean_seconds"], 1e-9), 2)
+        summary[target_lang] = entry
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare direct and translate-analyze-translate analysis quality and latency")
+    parser.add_argument("source", help="Directory of documents, or a manifest file listing one path per line")
+    parser.add_argument("-m", "--model", default="OpenAI (GPT-3.5)", help="Model name as shown in the app (default: OpenAI (GPT-3.5))")
+    parser.add_argument("-t", "--target-langs", default="en", help="Comma-separated target language codes (default: en)")
+    parser.add_argument("-o", "--output", default="analysis_mode_comparison.json", help="JSON report file (default: analysis_mode_comparison.json)")
+    parser.add_argument("--judge", action="store_true", help="Also ask the model to score each analysis from 1 to 10")
+    args = parser.parse_args(argv)
+
+    paths = collect_inputs(args.source)
+    target_langs = [code.strip() for code in args.target_langs.split(",") if code.strip()]
+    components = _build_components()
+
+    records = []
+    for path in paths:
+        try:
+            records.extend(compare_document(path, components, args.model, target_langs, judge=args.judge))
+        except Exception as e:
+            print(f"Failed: {path}: {str(e)}")
+
+    summary = summarize(records)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"model": args.model, "summary": summary, "documents": records}, f, ensure_ascii=False, indent=2)
+
+    for target_lang, entry in summary.items():
+        print(
+            f"{target_lang}: multi-hop {entry['multi_hop']['mean_seconds']}s, direct {entry['direct']['mean_seconds']}s, "
+            f"recommended {entry['recommended_mode']}"
+        )
+    print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,218 +1,409 @@
 import os
-from PIL import Image
-import docx
-import PyPDF2
+import re
 import base64
-import google.generativeai as genai
-from model_manager import ModelManager
+import multiprocessing
+import unicodedata
+from collections import Counter, deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from model_manager import get_model_manager
+from result_cache import ResultCache
+from language_detector import detect_script_language, CONFIDENCE_THRESHOLD
+from image_preprocessor import prepare_image, stitch_strips
+from docx_extractor import iter_docx_blocks
+from document_source import open_source, source_extension, source_path, file_size
+from text_cleaner import BoilerplateFilter
+from telemetry import span, count, bind_context, record_usage
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS + ['.pdf', '.doc', '.docx']
+
+IMAGE_OCR_PROMPT = "Extract all text from this image and identify what language it's in. First line should be just the language code (en, hi, ta, te, bn, mr, gu, kn, ml, pa, or). Then extract all the text."
+
+LANGUAGE_DETECTION_PROMPT = "You are a language detection expert. Analyze the following text and respond with ONLY the language code. Valid codes are: en (English), hi (Hindi), ta (Tamil), te (Telugu), bn (Bengali), mr (Marathi), gu (Gujarati), kn (Kannada), ml (Malayalam), pa (Punjabi), or (Odia/Oriya). Respond with ONLY the language code, nothing else."
+
+# Map language names/codes returned by the models to our supported language codes
+LANGUAGE_CODE_ALIASES = {
+    'hindi': 'hi',
+    'tamil': 'ta',
+    'telugu': 'te',
+    'bengali': 'bn',
+    'marathi': 'mr',
+    'gujarati': 'gu',
+    'kannada': 'kn',
+    'malayalam': 'ml',
+    'punjabi': 'pa',
+    'odia': 'or',
+    'oriya': 'or',
+    'english': 'en',
+    'hi': 'hi',
+    'ta': 'ta',
+    'te': 'te',
+    'bn': 'bn',
+    'mr': 'mr',
+    'gu': 'gu',
+    'kn': 'kn',
+    'ml': 'ml',
+    'pa': 'pa',
+    'or': 'or',
+    'en': 'en'
+}
+
+# Pages whose text layer is shorter than this, or mostly unreadable characters,
+# are treated as scanned and read with the vision model
+MIN_PAGE_TEXT_CHARS = 30
+MAX_GARBLED_RATIO = 0.2
+# Smaller embedded images are logos, seals and signatures rather than scanned text
+MIN_PAGE_IMAGE_BYTES = 4096
+
+def has_usable_text(text):
+    """Return True if a page's text layer looks like real text rather than empty or garbled output"""
+    visible = [ch for ch in text if not ch.isspace()]
+    if len(visible) < MIN_PAGE_TEXT_CHARS:
+        return False
+    # Broken font encodings show up as replacement, private-use and control characters
+    garbled = sum(1 for ch in visible if ch == '\ufffd' or unicodedata.category(ch) in ('Co', 'Cn', 'Cc'))
+    letters = sum(1 for ch in visible if ch.isalpha())
+    return garbled / len(visible) <= MAX_GARBLED_RATIO and letters / len(visible) >= 0.3
+
+# Large PDFs have their text layer extracted on a process pool, this many pages per task
+PDF_PAGE_RANGE_SIZE = 25
+
+def extract_page_range(pdf_path, start, stop):
+    """Return the text layer of pages start..stop-1 of a PDF; runs in a worker process"""
+    import PyPDF2
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[page_number].extract_text() or "" for page_number in range(start, stop)]
+
+def normalize_language_code(raw_code):
+    """Map a model's language answer to a supported language code, defaulting to English"""
+    # Remove anything that isn't a letter, e.g. punctuation or quotes around the code
+    cleaned = re.sub(r'[^a-z]', '', raw_code.strip().lower())
+    return LANGUAGE_CODE_ALIASES.get(cleaned, 'en')
 
 class DocumentProcessor:
-    def __init__(self):
-        # Initialize model manager
-        self.model_manager = ModelManager()
+    def __init__(self, model_manager=None):
+        # Share the process-wide model manager and its pooled clients
+        self.model_manager = model_manager or get_model_manager()
+        # Stage results are cached by file content so repeat uploads skip the work
+        self.cache = ResultCache()
+        # Strips of tall scanned images are read with this many concurrent requests
+        self.ocr_max_workers = int(os.getenv("OCR_MAX_WORKERS", "4"))
+        # PDFs with at least this many pages are extracted on a process pool
+        self.pdf_parallel_pages = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "100"))
+        self.pdf_workers = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
         
-    def extract_text_and_detect_language(self, file_path, selected_model="OpenAI (GPT-3.5)"):
+    def extract_text_and_detect_language(self, source, selected_model="OpenAI (GPT-3.5)", on_page=None,
+                                         on_cleanup=None, file_name=None):
         """Extract text from various file formats and detect language"""
-        file_extension = os.path.splitext(file_path)[1].lower()
+        # The document is a path, or bytes, a memoryview or a file-like upload read in place,
+        # in which case file_name gives its format.
+        # on_page(done, total) reports PDF progress, on_cleanup(stats) what boilerplate removal saved
+        file_extension = source_extension(source, file_name)
+        with open_source(source) as file:
+            return self._extract_and_detect(source, file, file_extension, selected_model, on_page, on_cleanup)
+    
+    def _extract_and_detect(self, source, file, file_extension, selected_model, on_page, on_cleanup):
+        """Extract and detect the language of an open document"""
+        doc_hash = self.cache.hash_stream(file)
+        count("document_bytes_total", file_size(file))
         
         # Extract text based on file type
-        if file_extension in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']:
-            # For images, use AI to extract text and detect language
-            return self._process_image_with_ai(file_path, selected_model)
-        elif file_extension == '.pdf':
-            text = self._extract_from_pdf(file_path)
-        elif file_extension in ['.doc', '.docx']:
-            text = self._extract_from_word(file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {file_extension}")
+        with span("extract", format=file_extension):
+            if file_extension in IMAGE_EXTENSIONS:
+                # For images, use AI to extract text and detect language
+                try:
+                    text, lang = self.cache.get_or_compute(
+                        "extract", [doc_hash, selected_model],
+                        lambda: self._process_image_with_ai(file, selected_model, file_extension)
+                    )
+                    return text, lang
+                except Exception as e:
+                    print(f"Image processing error: {str(e)}")
+                    # Return empty text with English as default
+                    return "", "en"
+            elif file_extension == '.pdf':
+                # Scanned pages are read with the selected model, so it is part of the key
+                text, cleanup = self.cache.get_or_compute(
+                    "extract_clean", [doc_hash, selected_model],
+                    lambda: self._clean_pages(self.iter_pdf_pages(source, selected_model, on_page, file))
+                )
+            elif file_extension in ['.doc', '.docx']:
+                # Word documents have no pages to compare, and headers are already deduplicated
+                text, cleanup = self.cache.get_or_compute(
+                    "extract_clean", [doc_hash],
+                    lambda: self._clean_pages(self.iter_word_sections(file), repeated_lines=False)
+                )
+            else:
+                raise ValueError(f"Unsupported file format: {file_extension}")
+        
+        if on_cleanup:
+            on_cleanup(cleanup)
         
         # Detect language using AI
-        lang = self._detect_language_with_ai(text, selected_model)
+        with span("detect"):
+            lang = self._detect_language(text, selected_model)
         
         return text, lang
     
-    def _extract_from_pdf(self, pdf_path):
-        """Extract text from PDF"""
-        text = ""
-        with open(pdf_path, 'rb') as file:
+    def iter_pdf_pages(self, pdf_source, selected_model=None, on_page=None, file=None):
+        """Yield the text of each PDF page in order, reading scanned pages with the vision model"""
+        # The PDF parser is only imported once a PDF actually turns up
+        import PyPDF2
+        # An already opened file for the source can be passed in to read it in place
+        with ExitStack() as stack:
+            if file is None:
+                file = stack.enter_context(open_source(pdf_source))
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=self.ocr_max_workers))
             pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-        return text
+            total_pages = len(pdf_reader.pages)
+            done_pages = 0
+            # Pages waiting to be yielded: text, or a future for a page being OCR'd
+            queued = deque()
+            
+            def finished_pages(wait):
+                nonlocal done_pages
+                # Yield finished pages from the front while later scanned pages are still being read
+                while queued and (wait or isinstance(queued[0], str) or queued[0].done()):
+                    head = queued.popleft()
+                    done_pages += 1
+                    if on_page:
+                        on_page(done_pages, total_pages)
+                    yield head if isinstance(head, str) else head.result()
+            
+            for page_number, page_text in self._iter_text_layer(pdf_source, file, pdf_reader, total_pages):
+                images = []
+                if selected_model is not None and not has_usable_text(page_text):
+                    images = self._page_images(pdf_reader.pages[page_number], page_number)
+                if images:
+                    queued.append(pool.submit(bind_context(self._ocr_page), images, page_text, page_number, selected_model))
+                else:
+                    queued.append(page_text)
+                yield from finished_pages(wait=False)
+            
+            yield from finished_pages(wait=True)
     
-    def _extract_from_word(self, docx_path):
-        """Extract text from Word document"""
-        doc = docx.Document(docx_path)
-        text = ""
-        for para in doc.paragraphs:
-            text += para.text + "\n"
-        return text
+    def _iter_text_layer(self, pdf_source, file, pdf_reader, total_pages):
+        """Yield (page number, text layer) for each page, fanning large PDFs out across processes"""
+        if total_pages < self.pdf_parallel_pages or self.pdf_workers < 2:
+            for page_number, page in enumerate(pdf_reader.pages):
+                with span("pdf_page"):
+                    page_text = page.extract_text() or ""
+                count("pages_total", method="text")
+                yield page_number, page_text
+            return
+        
+        print(f"Extracting {total_pages} pages on {self.pdf_workers} processes")
+        ranges = deque(
+            (start, min(start + PDF_PAGE_RANGE_SIZE, total_pages))
+            for start in range(0, total_pages, PDF_PAGE_RANGE_SIZE)
+        )
+        # Worker processes open the PDF themselves, so an in-memory upload is written to disk.
+        # They are spawned rather than forked: this process runs job, event loop and server
+        # threads whose locks a forked child could inherit while held
+        with source_path(pdf_source, file, suffix='.pdf') as pdf_path, \
+                ProcessPoolExecutor(max_workers=self.pdf_workers, mp_context=multiprocessing.get_context("spawn")) as processes:
+            # Only a couple of ranges per worker are in flight, so memory stays bounded
+            # however far the consumer falls behind
+            in_flight = deque()
+            while ranges or in_flight:
+                while ranges and len(in_flight) < self.pdf_workers * 2:
+                    start, stop = ranges.popleft()
+                    in_flight.append((start, processes.submit(extract_page_range, pdf_path, start, stop)))
+                start, future = in_flight.popleft()
+                # Pages are timed per range, since they are read in other processes
+                with span("pdf_page_range", first_page=start + 1):
+                    page_texts = future.result()
+                count("pages_total", len(page_texts), method="text")
+                for offset, page_text in enumerate(page_texts):
+                    yield start + offset, page_text
     
-    def _detect_language_with_ai(self, text, selected_model):
-        """Detect language using selected AI model"""
+    def _page_images(self, page, page_number):
+        """Return the (data, name) of the images on a PDF page that may contain scanned text"""
+        try:
+            return [
+                (image.data, image.name) for image in page.images
+                if len(image.data) >= MIN_PAGE_IMAGE_BYTES
+            ]
+        except Exception as e:
+            print(f"Could not read images on page {page_number + 1}: {str(e)}")
+            return []
+    
+    def _ocr_page(self, images, page_text, page_number, selected_model):
+        """Read the text of a scanned PDF page from its images, falling back to its text layer"""
+        count("pages_total", method="ocr")
+        try:
+            with span("ocr_page", page=page_number + 1):
+                texts = []
+                for data, name in images:
+                    strips = prepare_image(data, name)
+                    strip_texts = [
+                        self._parse_ocr_result(self._ocr_image(strip, mime_type, selected_model))[0]
+                        for strip, mime_type in strips
+                    ]
+                    texts.append(stitch_strips(strip_texts))
+                print(f"Read scanned page {page_number + 1} with the vision model")
+                return "\n".join(texts)
+        except Exception as e:
+            print(f"Scanned page {page_number + 1} could not be read: {str(e)}")
+            return page_text
+    
+    def iter_word_sections(self, docx_source, section_chars=4000):
+        """Yield a Word document's text in sections of about section_chars, as it is parsed"""
+        blocks = []
+        size = 0
+        for block in iter_docx_blocks(docx_source):
+            blocks.append(block)
+            size += len(block) + 1
+            if size >= section_chars:
+                yield "\n".join(blocks)
+                blocks = []
+                size = 0
+        if blocks:
+            yield "\n".join(blocks)
+    
+    def _clean_pages(self, pages, repeated_lines=True):
+        """Join pages with repeated headers, footers and page numbers removed; returns [text, stats with page offsets]"""
+        cleaner = BoilerplateFilter(repeated_lines=repeated_lines)
+        cleaned = []
+        for page_text in pages:
+            cleaned.extend(cleaner.feed(page_text))
+        cleaned.extend(cleaner.finish())
+        # Page offsets let the text viewer page through the document as it was extracted
+        stats = cleaner.summary()
+        stats["page_starts"] = cleaner.page_starts
+        return ["".join(page_text + "\n" for page_text in cleaned), stats]
+    
+    def _detect_language(self, text, selected_model):
+        """Detect language, reusing a cached result for the same text and model"""
         if not text or len(text.strip()) < 20:
             return "en"  # Default to English for very short texts
-            
+        
+        # The script histogram settles most documents locally; only ask the model when unsure
+        local_lang, confidence = detect_script_language(text)
+        if confidence >= CONFIDENCE_THRESHOLD:
+            print(f"Detected language locally: {local_lang} (confidence {confidence:.2f})")
+            return local_lang
+        
+        # Only the leading sample is sent to the model, so it is the cache key
+        sample_hash = self.cache.hash_content(text[:2000])
+        try:
+            return self.cache.get_or_compute(
+                "detect", [sample_hash, selected_model],
+                lambda: self._detect_language_with_ai(text, selected_model)
+            )
+        except Exception as e:
+            print(f"Language detection error: {str(e)}")
+            return 'en'  # Default to English if detection fails
+    
+    def _detect_language_with_ai(self, text, selected_model):
+        """Detect language using selected AI model"""
         # Take a larger sample for better detection
         sample_text = text[:2000]  # Increase sample size
         
+        detected_lang = self.model_manager.generate(
+            selected_model,
+            LANGUAGE_DETECTION_PROMPT,
+            sample_text,
+            temperature=0.1,  # Lower temperature for more deterministic results
+            max_tokens=10
+        )
+        
+        # Print for debugging
+        print(f"Raw detected language: {detected_lang}")
+        
+        return normalize_language_code(detected_lang)
+    
+    def _process_image_with_ai(self, image_source, selected_model, file_extension=None):
+        """Process image with AI to extract text and detect language"""
+        # Fix orientation, convert to grayscale, downscale and split tall scans into strips
+        images = prepare_image(image_source, file_extension and "image" + file_extension)
+        
+        if len(images) == 1:
+            return self._parse_ocr_result(self._ocr_image(images[0][0], images[0][1], selected_model))
+        
+        # Strips are read concurrently and stitched back together in order
+        print(f"Reading tall image as {len(images)} overlapping strips")
+        with ThreadPoolExecutor(max_workers=min(len(images), self.ocr_max_workers)) as pool:
+            results = list(pool.map(
+                bind_context(lambda image: self._parse_ocr_result(self._ocr_image(image[0], image[1], selected_model))),
+                images
+            ))
+        
+        text = stitch_strips([strip_text for strip_text, _ in results])
+        lang_code = Counter(strip_lang for _, strip_lang in results).most_common(1)[0][0]
+        local_lang, confidence = detect_script_language(text)
+        if confidence >= CONFIDENCE_THRESHOLD:
+            lang_code = local_lang
+        return text, lang_code
+    
+    def _ocr_image(self, image_bytes, mime_type, selected_model):
+        """Send one image to the vision model and return its raw reply"""
+        b64_image = base64.b64encode(image_bytes).decode("utf-8")
+        
         client, model_type = self.model_manager.get_client(selected_model)
         
-        try:
-            if model_type == "openai":
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
+        if model_type == "openai":
+            # Call OpenAI API with the image, with the model manager's timeout, retries and breaker
+            try:
+                response = self.model_manager.call_with_retries("openai", lambda: client.chat.completions.create(
+                    model="gpt-4-vision-preview",
                     messages=[
-                        {"role": "system", "content": "You are a language detection expert. Analyze the following text and respond with ONLY the language code. Valid codes are: en (English), hi (Hindi), ta (Tamil), te (Telugu), bn (Bengali), mr (Marathi), gu (Gujarati), kn (Kannada), ml (Malayalam), pa (Punjabi), or (Odia/Oriya). Respond with ONLY the language code, nothing else."},
-                        {"role": "user", "content": sample_text}
+                        {
+                            "role": "user",
+                            "content": [
+                                {"type": "text", "text": IMAGE_OCR_PROMPT},
+                                {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{b64_image}"}}
+                            ]
+                        }
                     ],
-                    temperature=0.1,  # Lower temperature for more deterministic results
-                    max_tokens=10
-                )
-                detected_lang = response.choices[0].message.content.strip().lower()
-            
-            elif model_type == "gemini":
-                gemini_model = genai.GenerativeModel('gemini-pro')
-                response = gemini_model.generate_content([
-                    "You are a language detection expert. Analyze the following text and respond with ONLY the language code. Valid codes are: en (English), hi (Hindi), ta (Tamil), te (Telugu), bn (Bengali), mr (Marathi), gu (Gujarati), kn (Kannada), ml (Malayalam), pa (Punjabi), or (Odia/Oriya). Respond with ONLY the language code, nothing else.",
-                    sample_text
-                ])
-                detected_lang = response.text.strip().lower()
-            
-            # Clean up the response to ensure we get just the language code
-            # Remove any non-alphanumeric characters
-            import re
-            detected_lang = re.sub(r'[^a-z]', '', detected_lang)
-            
-            # Map to our supported language codes
-            lang_mapping = {
-                'hindi': 'hi',
-                'tamil': 'ta',
-                'telugu': 'te',
-                'bengali': 'bn',
-                'marathi': 'mr',
-                'gujarati': 'gu',
-                'kannada': 'kn',
-                'malayalam': 'ml',
-                'punjabi': 'pa',
-                'odia': 'or',
-                'oriya': 'or',
-                'english': 'en',
-                'hi': 'hi',
-                'ta': 'ta',
-                'te': 'te',
-                'bn': 'bn',
-                'mr': 'mr',
-                'gu': 'gu',
-                'kn': 'kn',
-                'ml': 'ml',
-                'pa': 'pa',
-                'or': 'or',
-                'en': 'en'
-            }
-            
-            # Print for debugging
-            print(f"Raw detected language: {detected_lang}")
+                    max_tokens=1000,
+                    timeout=self.model_manager.call_timeout
+                ))
+                
+                record_usage("openai", len(image_bytes) + len(IMAGE_OCR_PROMPT), response)
+                
+                # Parse the response
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                print(f"OpenAI vision error: {str(e)}")
+                raise
             
-            return lang_mapping.get(detected_lang, 'en')
-        except Exception as e:
-            print(f"Language detection error: {str(e)}")
-            return 'en'  # Default to English if detection fails
+        elif model_type == "gemini":
+            # Use Gemini for image processing
+            try:
+                gemini_model = self.model_manager.get_gemini_model('gemini-pro-vision')
+                response = self.model_manager.call_with_retries("gemini", lambda: gemini_model.generate_content([
+                    IMAGE_OCR_PROMPT,
+                    {"mime_type": mime_type, "data": b64_image}
+                ], request_options={"timeout": self.model_manager.call_timeout}))
+                record_usage("gemini", len(image_bytes) + len(IMAGE_OCR_PROMPT), response)
+                return response.text.strip()
+            except Exception as e:
+                print(f"Gemini vision error: {str(e)}")
+                raise
     
-    def _process_image_with_ai(self, image_path, selected_model):
-        """Process image with AI to extract text and detect language"""
-        try:
-            # Read image file and encode as base64
-            with open(image_path, "rb") as image_file:
-                b64_image = base64.b64encode(image_file.read()).decode("utf-8")
+    def _parse_ocr_result(self, result):
+        """Split a vision reply into (text, language code)"""
+        # Extract language code and text
+        lines = result.split('\n', 1)
+        if len(lines) >= 2:
+            lang_code = lines[0]
+            extracted_text = lines[1].strip()
             
-            client, model_type = self.model_manager.get_client(selected_model)
+            # Print for debugging
+            print(f"Raw detected language from image: {lang_code}")
             
-            if model_type == "openai":
-                # Call OpenAI API with the image
-                try:
-                    response = client.chat.completions.create(
-                        model="gpt-4-vision-preview",
-                        messages=[
-                            {
-                                "role": "user",
-                                "content": [
-                                    {"type": "text", "text": "Extract all text from this image and identify what language it's in. First line should be just the language code (en, hi, ta, te, bn, mr, gu, kn, ml, pa, or). Then extract all the text."},
-                                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64_image}"}}
-                                ]
-                            }
-                        ],
-                        max_tokens=1000
-                    )
-                    
-                    # Parse the response
-                    result = response.choices[0].message.content.strip()
-                except Exception as e:
-                    print(f"OpenAI vision error: {str(e)}")
-                    # Fallback to gpt-3.5-turbo if vision model fails
-                    print("Falling back to text-only model for language detection")
-                    return "", "en"
-                
-            elif model_type == "gemini":
-                # Use Gemini for image processing
-                try:
-                    gemini_model = genai.GenerativeModel('gemini-pro-vision')
-                    response = gemini_model.generate_content([
-                        "Extract all text from this image and identify what language it's in. First line should be just the language code (en, hi, ta, te, bn, mr, gu, kn, ml, pa, or). Then extract all the text.",
-                        {"mime_type": "image/jpeg", "data": b64_image}
-                    ])
-                    result = response.text.strip()
-                except Exception as e:
-                    print(f"Gemini vision error: {str(e)}")
-                    return "", "en"
+            lang_code = normalize_language_code(lang_code)
             
-            # Extract language code and text
-            lines = result.split('\n', 1)
-            if len(lines) >= 2:
-                lang_code = lines[0].strip().lower()
-                extracted_text = lines[1].strip()
-                
-                # Clean up language code
-                import re
-                lang_code = re.sub(r'[^a-z]', '', lang_code)
-                
-                # Map language names/codes to our codes
-                lang_mapping = {
-                    'hindi': 'hi',
-                    'tamil': 'ta',
-                    'telugu': 'te',
-                    'bengali': 'bn',
-                    'marathi': 'mr',
-                    'gujarati': 'gu',
-                    'kannada': 'kn',
-                    'malayalam': 'ml',
-                    'punjabi': 'pa',
-                    'odia': 'or',
-                    'oriya': 'or',
-                    'english': 'en',
-                    'hi': 'hi',
-                    'ta': 'ta',
-                    'te': 'te',
-                    'bn': 'bn',
-                    'mr': 'mr',
-                    'gu': 'gu',
-                    'kn': 'kn',
-                    'ml': 'ml',
-                    'pa': 'pa',
-                    'or': 'or',
-                    'en': 'en'
-                }
-                
-                # Print for debugging
-                print(f"Raw detected language from image: {lang_code}")
-                
-                lang_code = lang_mapping.get(lang_code, 'en')
-                return extracted_text, lang_code
-            else:
-                return result, "en"  # Default to English if format is unexpected
-                
-        except Exception as e:
-            print(f"Image processing error: {str(e)}")
-            # Return empty text with English as default
-            return "", "en"
\ No newline at end of file
+            # Cross-check the model's answer against the script of the text it extracted
+            local_lang, confidence = detect_script_language(extracted_text)
+            if confidence >= CONFIDENCE_THRESHOLD and local_lang != lang_code:
+                print(f"Overriding image language {lang_code} with locally detected {local_lang}")
+                lang_code = local_lang
+            return extracted_text, lang_code
+        else:
+            # Fall back to the local detector if the format is unexpected
+            local_lang, confidence = detect_script_language(result)
+            return result, local_lang if confidence >= CONFIDENCE_THRESHOLD else "en"
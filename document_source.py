@@ -0,0 +1,83 @@
+import io
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Streams that cannot be read in place are copied into memory up to this size,
+# and to an anonymous temporary file beyond it
+SPILL_BYTES = int(float(os.getenv("UPLOAD_SPILL_MB", "16")) * 1024 * 1024)
+
+
+def source_extension(source, file_name=None):
+    """Return the lower-case extension of a document given as a path, or of its original file name"""
+    name = file_name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    return os.path.splitext(name or "")[1].lower()
+
+
+@contextmanager
+def open_source(source, spill_bytes=None):
+    """Yield a seekable binary file for a path, bytes, memoryview or file-like document"""
+    if isinstance(source, str):
+        with open(source, "rb") as file:
+            yield file
+        return
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO shares a bytes object's buffer rather than copying it
+        yield io.BytesIO(source)
+        return
+
+    if _is_seekable(source):
+        # Read uploads such as Streamlit's in place; the caller keeps ownership of the file
+        source.seek(0)
+        yield source
+        return
+
+    # A pipe or network stream is read once into a buffer that moves to disk when it
+    # grows past the threshold; the file has no name on disk and vanishes when closed
+    limit = SPILL_BYTES if spill_bytes is None else spill_bytes
+    with tempfile.SpooledTemporaryFile(max_size=limit) as spooled:
+        shutil.copyfileobj(source, spooled, 1024 * 1024)
+        spooled.seek(0)
+        yield spooled
+
+
+@contextmanager
+def source_path(source, file, suffix=""):
+    """Yield a path to the document, writing it to a temporary file only if it has none"""
+    if isinstance(source, str):
+        yield source
+        return
+
+    # Worker processes need a path to open; the file is removed when the block exits,
+    # even on error
+    with tempfile.NamedTemporaryFile(suffix=suffix) as spilled:
+        position = file.tell()
+        file.seek(0)
+        shutil.copyfileobj(file, spilled, 1024 * 1024)
+        file.seek(position)
+        spilled.flush()
+        yield spilled.name
+
+
+def file_size(file):
+    """Return the size in bytes of a seekable file, leaving its position unchanged"""
+    position = file.tell()
+    size = file.seek(0, io.SEEK_END)
+    file.seek(position)
+    return size
+
+
+def read_bytes(source):
+    """Return the whole document as bytes"""
+    with open_source(source) as file:
+        return file.read()
+
+
+def _is_seekable(file):
+    """Return True if a file-like object supports seeking back to its start"""
+    try:
+        return file.seekable()
+    except (AttributeError, ValueError):
+        return False
@@ -0,0 +1,122 @@
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+PARAGRAPH = W_NS + "p"
+TABLE = W_NS + "tbl"
+ROW = W_NS + "tr"
+CELL = W_NS + "tc"
+TEXT = W_NS + "t"
+TAB = W_NS + "tab"
+BREAKS = (W_NS + "br", W_NS + "cr")
+# Alternate content repeats what the mc:Choice holds (e.g. a text box as VML), so it is skipped
+FALLBACK = MC_NS + "Fallback"
+
+# Cells of a table row are joined with this, so a schedule row stays on one line
+CELL_SEPARATOR = " | "
+
+HEADER_PART = re.compile(r'^word/header\d*\.xml$')
+NOTE_PARTS = ("word/footnotes.xml", "word/endnotes.xml")
+
+
+def iter_docx_blocks(docx_path):
+    """Yield the text of a Word document's headers, paragraphs, table rows and notes in document order"""
+    with zipfile.ZipFile(docx_path) as archive:
+        names = set(archive.namelist())
+
+        # Headers repeat on every page, so each distinct one is emitted once, up front
+        seen_headers = set()
+        for name in sorted(n for n in names if HEADER_PART.match(n)):
+            for block in _iter_part(archive, name):
+                if block.strip() and block not in seen_headers:
+                    seen_headers.add(block)
+                    yield block
+
+        yield from _iter_part(archive, "word/document.xml")
+
+        for name in NOTE_PARTS:
+            if name in names:
+                for block in _iter_part(archive, name):
+                    if block.strip():
+                        yield block
+
+
+def _iter_part(archive, name):
+    """Stream one XML part of the document, yielding top-level paragraphs and table rows"""
+    # Open paragraphs of the cells being read, and the cells of the rows being read;
+    # nested tables make these stacks deeper than one
+    cell_stack = []
+    row_stack = []
+    # Ancestors of the element being parsed, so finished blocks can be dropped from the tree
+    parents = []
+    # Open paragraphs and fallbacks; anything inside one is read with the enclosing paragraph
+    # (text boxes) or not at all (fallbacks), never as a block of its own
+    enclosing = 0
+
+    with archive.open(name) as part:
+        for event, elem in ET.iterparse(part, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                if not enclosing:
+                    if elem.tag == CELL:
+                        cell_stack.append([])
+                    elif elem.tag == ROW:
+                        row_stack.append([])
+                if elem.tag in (PARAGRAPH, FALLBACK):
+                    enclosing += 1
+                continue
+
+            parents.pop()
+            if elem.tag in (PARAGRAPH, FALLBACK):
+                enclosing -= 1
+            if enclosing:
+                continue
+            if elem.tag == FALLBACK:
+                pass  # Skipped outside any paragraph; only released below
+            elif elem.tag == PARAGRAPH:
+                text = _paragraph_text(elem)
+                if cell_stack:
+                    cell_stack[-1].append(text)
+                else:
+                    yield text
+            elif elem.tag == CELL:
+                row_stack[-1].append("\n".join(p for p in cell_stack.pop() if p))
+            elif elem.tag == ROW:
+                row = CELL_SEPARATOR.join(cell.replace("\n", " ") for cell in row_stack.pop())
+                if cell_stack:
+                    # A row of a nested table becomes a line of the enclosing cell
+                    cell_stack[-1].append(row)
+                else:
+                    yield row
+            else:
+                continue
+
+            # Release the finished block so memory stays flat however long the document is
+            if not cell_stack and parents:
+                parents[-1].remove(elem)
+
+
+def _paragraph_text(paragraph):
+    """Return the visible text of a paragraph, keeping tabs and line breaks"""
+    pieces = []
+    _collect_text(paragraph, pieces)
+    return "".join(pieces)
+
+
+def _collect_text(node, pieces):
+    """Append the text under node to pieces, putting paragraphs of text boxes on lines of their own"""
+    for child in node:
+        if child.tag == FALLBACK:
+            continue
+        if child.tag == TEXT:
+            pieces.append(child.text or "")
+        elif child.tag == TAB:
+            pieces.append("\t")
+        elif child.tag in BREAKS:
+            pieces.append("\n")
+        elif child.tag == PARAGRAPH:
+            pieces.append("\n")
+        _collect_text(child, pieces)
@@ -0,0 +1,339 @@
+"""Local stand-in for the OpenAI and Gemini APIs, for offline benchmarks and demos.
+
+Example:
+    python fake_llm_server.py --port 8089 --latency 0.4 --token-rate 60 --error-rate 0.05
+
+Then point the app at it:
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake \\
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 GEMINI_API_KEY=fake streamlit run app.py
+
+The server answers OpenAI chat completions (plain and streamed) and Gemini
+generateContent/streamGenerateContent REST calls. Replies are shaped by the
+app's prompts: language codes for detection, text for OCR, tagged lines with
+segment markers kept for translation, notes for chunks and the four analysis
+sections for analyses. Each reply waits for a base latency plus the time to
+"generate" its tokens at the configured token rate. A share of requests can
+fail with 429, 500 or 503, or hang, to exercise retries, failover and
+timeouts.
+"""
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from language_detector import detect_script_language
+from utils import estimate_tokens
+
+INJECTED_STATUSES = (429, 500, 503)
+
+# Translated lines are the source lines behind this tag, e.g. "[translated] ..."
+TRANSLATION_TAG = "translated"
+
+_GEMINI_PATH = re.compile(r'^/v1(?:beta)?/models/([^/:]+):(generateContent|streamGenerateContent)$')
+
+
+def fake_reply(system_prompt, user_text, has_image=False, rng=random):
+    """Return a plausible reply to one of the app's prompts"""
+    if has_image:
+        # OCR: the language code on the first line, then the page text
+        lines = [
+            f"Scanned notice line {i + 1}: the respondent shall appear on {rng.randint(1, 28)}/{rng.randint(1, 12)}/2024 "
+            f"in case no. {rng.randint(100, 9999)}"
+            for i in range(rng.randint(8, 16))
+        ]
+        return "en\n" + "\n".join(lines)
+    if "language detection" in system_prompt:
+        lang, _ = detect_script_language(user_text)
+        return lang
+    if "translator" in system_prompt:
+        # Lines are marked as translated so callers can tell a reply from their own text;
+        # batch translation keeps every segment marker
+        return "\n".join(
+            line if not line.strip() or re.match(r'^\s*\[\[\d+\]\]\s*$', line) else f"[{TRANSLATION_TAG}] {line}"
+            for line in user_text.split("\n")
+        )
+    if "Win Probability" in system_prompt:
+        return (
+            "1. 🧾 Case Summary: The petitioner seeks relief against the respondent over a disputed notice.\n\n"
+            "2. 📜 Relevant Laws: Section 138 of the Negotiable Instruments Act; Article 226 of the Constitution.\n\n"
+            "3. 💡 Legal Advice: Reply to the notice within the time allowed and keep copies of every document.\n\n"
+            f"4. 📈 Win Probability: {rng.randint(30, 80)}% based on the documents provided."
+        )
+    # The reduce prompt also mentions notes on parts, so it is matched as an analysis first
+    if "notes" in system_prompt.lower() and "part" in system_prompt:
+        return (
+            "- Parties: petitioner and respondent\n"
+            f"- Key facts: events on {rng.randint(1, 28)}/{rng.randint(1, 12)}/2023\n"
+            f"- Laws cited: Section {rng.randint(100, 500)} IPC\n"
+            "- Findings: None"
+        )
+    if "Score the analysis" in system_prompt:
+        return str(rng.randint(5, 9))
+    return user_text[:2000]
+
+
+class FakeLLMServer:
+    """Threaded HTTP server answering OpenAI and Gemini requests with injected latency and errors"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.1, token_rate=50.0,
+                 error_rate=0.0, hang_rate=0.0, hang_seconds=30.0, seed=None):
+        self.host = host
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors_injected": 0, "hangs_injected": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+        handler = type("Handler", (_Handler,), {"fake": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = None
+
+    @property
+    def openai_base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def gemini_endpoint(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Serve on a background thread; returns self"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self):
+        """Decide one request's fate: (status or None, delay before the first token, seconds per token)"""
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._rng.random()
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            if roll < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return self._rng.choice(INJECTED_STATUSES), delay, 0.0
+            if roll < self.error_rate + self.hang_rate:
+                self.stats["hangs_injected"] += 1
+                return None, self.hang_seconds, 0.0
+        return None, delay, 1.0 / self.token_rate if self.token_rate > 0 else 0.0
+
+    def _count_tokens(self, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["completion_tokens"] += completion_tokens
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Route OpenAI and Gemini requests to the fake replies"""
+    protocol_version = "HTTP/1.1"
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "Invalid JSON"}})
+            return
+
+        path, _, query = self.path.partition("?")
+        gemini = _GEMINI_PATH.match(path)
+        if path.endswith("/chat/completions"):
+            self._openai(body)
+        elif gemini:
+            self._gemini(body, gemini.group(1), gemini.group(2) == "streamGenerateContent", "alt=sse" in query)
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {path}"}})
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _reply(self, system_prompt, user_text, has_image, max_tokens):
+        """Wait like a model would and return (status or None, reply, pieces, prompt tokens, seconds per token)"""
+        status, delay, per_token = self.fake._draw()
+        time.sleep(delay)
+        if status is not None:
+            return status, None, [], 0, 0.0
+        reply = fake_reply(system_prompt, user_text, has_image, self.fake._rng)
+        if max_tokens:
+            reply = reply[:max_tokens * 4]
+        # Stream in pieces of about four tokens
+        pieces = re.findall(r'\S+\s*', reply, re.DOTALL) or [reply]
+        pieces = ["".join(pieces[i:i + 4]) for i in range(0, len(pieces), 4)]
+        prompt_tokens = estimate_tokens(system_prompt + user_text)
+        self.fake._count_tokens(prompt_tokens, estimate_tokens(reply))
+        return None, reply, pieces, prompt_tokens, per_token
+
+    def _openai(self, body):
+        system_prompt, user_text, has_image = "", "", False
+        for message in body.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, list):
+                for part in content:
+                    if part.get("type") == "text":
+                        system_prompt += part.get("text", "")
+                    elif part.get("type") == "image_url":
+                        has_image = True
+            elif message.get("role") == "system":
+                system_prompt += content or ""
+            else:
+                user_text += content or ""
+
+        status, reply, pieces, prompt_tokens, per_token = self._reply(
+            system_prompt, user_text, has_image, body.get("max_tokens")
+        )
+        if status is not None:
+            self._send_json(status, {"error": {"message": f"Injected error {status}", "type": "server_error"}})
+            return
+
+        model = body.get("model", "gpt-3.5-turbo")
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(reply),
+            "total_tokens": prompt_tokens + estimate_tokens(reply),
+        }
+        if not body.get("stream"):
+            time.sleep(per_token * usage["completion_tokens"])
+            self._send_json(200, {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self._start_stream("text/event-stream")
+        for piece in pieces:
+            time.sleep(per_token * estimate_tokens(piece))
+            chunk = {
+                "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [], "usage": usage}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self._write_chunk("data: [DONE]\n\n")
+        self._end_stream()
+
+    def _gemini(self, body, model, stream, sse):
+        texts, has_image = [], False
+        for content in body.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    texts.append(part["text"])
+                elif "inline_data" in part or "inlineData" in part:
+                    has_image = True
+        # The app sends the system prompt as the first part and the content as the second
+        system_prompt = texts[0] if texts else ""
+        user_text = "\n".join(texts[1:])
+        config = body.get("generationConfig") or body.get("generation_config") or {}
+        max_tokens = config.get("maxOutputTokens") or config.get("max_output_tokens")
+
+        status, reply, pieces, prompt_tokens, per_token = self._reply(system_prompt, user_text, has_image, max_tokens)
+        if status is not None:
+            names = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+            self._send_json(status, {"error": {"code": status, "message": f"Injected error {status}", "status": names[status]}})
+            return
+
+        def response(text, final):
+            payload = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+            if final:
+                payload["candidates"][0]["finishReason"] = "STOP"
+                completion_tokens = estimate_tokens(reply)
+                payload["usageMetadata"] = {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": completion_tokens,
+                    "totalTokenCount": prompt_tokens + completion_tokens,
+                }
+            return json.dumps(payload, ensure_ascii=False)
+
+        if not stream:
+            time.sleep(per_token * estimate_tokens(reply))
+            data = response(reply, True).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # Server-sent events with alt=sse, otherwise a JSON array written piece by piece
+        self._start_stream("text/event-stream" if sse else "application/json")
+        for i, piece in enumerate(pieces):
+            time.sleep(per_token * estimate_tokens(piece))
+            final = i == len(pieces) - 1
+            if sse:
+                self._write_chunk(f"data: {response(piece, final)}\n\n")
+            else:
+                self._write_chunk(("[" if i == 0 else ",") + response(piece, final) + ("]" if final else ""))
+        self._end_stream()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI and Gemini APIs with injected latency and errors")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8089, help="Port to listen on (default: 8089)")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token (default: 0.2)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- seconds added to the latency (default: 0.1)")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="Reply tokens per second; 0 for instant (default: 50)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with 429/500/503 (default: 0)")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that hang (default: 0)")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="How long a hanging request waits (default: 30)")
+    parser.add_argument("--seed", type=int, help="Random seed, for repeatable runs")
+    args = parser.parse_args(argv)
+
+    server = FakeLLMServer(
+        args.host, args.port, args.latency, args.jitter, args.token_rate,
+        args.error_rate, args.hang_rate, args.hang_seconds, args.seed
+    )
+    print(f"OpenAI base URL: {server.openai_base_url}")
+    print(f"Gemini endpoint: {server.gemini_endpoint}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(json.dumps(server.stats))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import io
+import os
+import re
+import mimetypes
+from document_source import read_bytes
+
+# Vision models downscale anything larger than this before reading it, so sending
+# more pixels only costs upload time
+MAX_LONG_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "2048"))
+
+# Scans taller than this height/width ratio are cut into overlapping strips, since
+# the models would otherwise shrink them until the text is unreadable
+TILE_ASPECT = 2.0
+STRIP_ASPECT = 1.4
+STRIP_OVERLAP = 0.1
+
+JPEG_QUALITY = 85
+
+
+def prepare_image(source, name=None):
+    """Return a list of (bytes, mime_type) images ready for vision OCR, one per strip"""
+    # Accept a file path, an open file, or the raw bytes of an image, e.g. one embedded in a PDF
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    try:
+        # Pillow is only imported once an image actually turns up
+        from PIL import Image, ImageOps
+        readable = isinstance(source, str) or hasattr(source, "read")
+        with Image.open(source if readable else io.BytesIO(source)) as image:
+            # Apply the camera's EXIF rotation so phone photos are upright
+            image = ImageOps.exif_transpose(image)
+            # Text reads as well in grayscale and compresses much better
+            image = image.convert("L")
+            return [_encode(strip) for strip in _split_into_strips(image)]
+    except Exception as e:
+        print(f"Image preprocessing error, sending original image: {str(e)}")
+        mime_type = mimetypes.guess_type(str(name))[0] or "image/jpeg"
+        return [(read_bytes(source), mime_type)]
+
+
+def _split_into_strips(image):
+    """Cut a very tall image into overlapping strips, top to bottom"""
+    width, height = image.size
+    if height <= width * TILE_ASPECT:
+        return [image]
+
+    strip_height = int(width * STRIP_ASPECT)
+    step = int(strip_height * (1 - STRIP_OVERLAP))
+    strips = []
+    top = 0
+    while True:
+        bottom = min(top + strip_height, height)
+        strips.append(image.crop((0, top, width, bottom)))
+        if bottom >= height:
+            break
+        top += step
+    return strips
+
+
+def _encode(image):
+    """Downscale an image to what the vision models use and encode it as JPEG"""
+    from PIL import Image
+    longest = max(image.size)
+    if longest > MAX_LONG_SIDE:
+        scale = MAX_LONG_SIDE / longest
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.LANCZOS
+        )
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), "image/jpeg"
+
+
+def stitch_strips(texts, max_overlap_lines=8):
+    """Join text read from overlapping strips, dropping lines repeated across each seam"""
+    def normalize(line):
+        return re.sub(r'\s+', ' ', line).strip()
+
+    lines = []
+    for text in texts:
+        new_lines = text.split("\n")
+        # Find the longest run of lines ending the text so far that also starts this strip
+        overlap = 0
+        for size in range(min(max_overlap_lines, len(lines), len(new_lines)), 0, -1):
+            if [normalize(l) for l in lines[-size:]] == [normalize(l) for l in new_lines[:size]]:
+                overlap = size
+                break
+        lines.extend(new_lines[overlap:])
+    return "\n".join(lines)
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from document_source import read_bytes
+from result_cache import ResultCache
+from telemetry import tracing, count
+
+# Share of the progress bar reached when each pipeline stage reports; extraction
+# fills the first part page by page
+STAGE_PROGRESS = {
+    "queued": 0.0,
+    "extract": 0.05,
+    "detect": 0.4,
+    "clean": 0.45,
+    "translate": 0.5,
+    "analyze_chunk": 0.6,
+    "analyze": 0.85,
+    "translate_output": 0.95,
+    "done": 1.0,
+}
+
+STAGE_LABELS = {
+    "queued": "Waiting for a worker",
+    "extract": "Extracting text",
+    "detect": "Detecting language",
+    "clean": "Removing headers and footers",
+    "translate": "Translating to English",
+    "analyze_chunk": "Reading the document in parts",
+    "analyze": "Writing the analysis",
+    "translate_output": "Translating the analysis",
+    "done": "Done",
+}
+
+# Finished jobs are kept this long so their results and traces can still be looked up
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+# Progress, and the analysis as it streams in, are written to the job table at most
+# this often within one stage
+PROGRESS_INTERVAL_SECONDS = 0.5
+
+# Spans kept in a finished job's trace; the rest are only counted in its stage totals
+TRACE_MAX_SPANS = 300
+
+
+def job_progress(job):
+    """Return (fraction, label) describing how far a job has got, for a progress bar"""
+    stage = "done" if job["status"] == "done" else job["stage"] or "queued"
+    fraction = STAGE_PROGRESS.get(stage, 0.0)
+    label = STAGE_LABELS.get(stage, stage)
+    detail = job.get("progress") or {}
+    if stage == "extract" and detail.get("pages"):
+        # Pages run from the start of extraction up to language detection
+        share = min(1.0, detail["page"] / detail["pages"])
+        fraction += (STAGE_PROGRESS["detect"] - fraction) * share
+        label = f"Extracted page {detail['page']} of {detail['pages']}"
+    elif stage in ("translate", "analyze_chunk") and detail.get("chunk"):
+        label = f"{label} (part {detail['chunk']})"
+    return fraction, label
+
+
+class JobQueue:
+    """Run document analyses on background workers, tracking each job in a SQLite table"""
+
+    def __init__(self, pipeline=None, db_path=None, max_workers=None):
+        if pipeline is None:
+            from pipeline import DocumentPipeline
+            pipeline = DocumentPipeline()
+        self.pipeline = pipeline
+        self.db_path = db_path or os.getenv("JOB_QUEUE_PATH", os.path.join(".cache", "jobs.sqlite3"))
+        self.max_workers = max_workers or int(os.getenv("JOB_WORKERS", "2"))
+
+        self._lock = threading.Lock()
+        # Jobs still queued or running, by key, so identical requests share one run
+        self._inflight = {}
+        self._futures = {}
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis-job")
+        self._conn = self._connect()
+
+    def _connect(self):
+        """Open the job table, falling back to an in-memory table if the file cannot be used"""
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+            # WAL lets another process read job status while workers write
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            print(f"Job queue cannot open {self.db_path}, keeping jobs in memory: {str(e)}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, key TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, progress TEXT, "
+            "result TEXT, error TEXT, file_name TEXT, options TEXT, created REAL NOT NULL, updated REAL NOT NULL, "
+            "partial TEXT)"
+        )
+        # Tables from before the analysis was streamed into the job row lack the partial column
+        if "partial" not in [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]:
+            conn.execute("ALTER TABLE jobs ADD COLUMN partial TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, status)")
+        now = time.time()
+        # Workers do not survive a restart; their jobs have to be submitted again
+        conn.execute(
+            "UPDATE jobs SET status = 'interrupted', updated = ? WHERE status IN ('queued', 'running')", (now,)
+        )
+        conn.execute("DELETE FROM jobs WHERE updated < ?", (now - JOB_RETENTION_SECONDS,))
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def make_key(document_hash, selected_model, target_lang, direct):
+        """Return the key shared by requests that would produce the same result, for joining in-flight jobs"""
+        raw_key = "\x1f".join([document_hash, selected_model, target_lang, "direct" if direct else "translate"])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def submit(self, source, file_name=None, selected_model="OpenAI (GPT-3.5)", target_lang="en", direct=False):
+        """Queue an analysis and return its job id, joining an identical job still in progress"""
+        data = read_bytes(source)
+        if file_name is None and isinstance(source, str):
+            file_name = os.path.basename(source)
+        key = self.make_key(ResultCache.hash_content(data), selected_model, target_lang, direct)
+
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                print(f"Joining in-flight job {job_id} for {file_name}")
+                return job_id
+            # Finished jobs are not reused: the result cache answers repeats, and it is
+            # keyed on the cache version and statute index as well as the document
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            options = {"model": selected_model, "target_lang": target_lang, "direct": direct}
+            self._conn.execute(
+                "INSERT INTO jobs (id, key, status, stage, file_name, options, created, updated) "
+                "VALUES (?, ?, 'queued', 'queued', ?, ?, ?, ?)",
+                (job_id, key, file_name, json.dumps(options), now, now)
+            )
+            self._conn.commit()
+            self._inflight[key] = job_id
+            self._futures[job_id] = self._executor.submit(
+                self._run, job_id, key, data, file_name, selected_model, target_lang, direct
+            )
+        return job_id
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it is unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, stage, progress, result, error, file_name, options, created, updated, partial "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ["id", "status", "stage", "progress", "result", "error", "file_name", "options", "created", "updated", "partial"],
+            row
+        ))
+        for field in ("progress", "result", "options"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Block until a job started by this queue finishes, then return it"""
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout=timeout)
+        return self.get(job_id)
+
+    def _update(self, job_id, **fields):
+        """Write the given columns of a job row"""
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            self._conn.commit()
+
+    def _run(self, job_id, key, data, file_name, selected_model, target_lang, direct):
+        """Run one job on a worker thread and record its outcome"""
+        last = {"stage": None, "written": 0.0, "partial": 0.0}
+
+        def on_progress(stage, detail):
+            # Pages and chunks report often; only stage changes are always written
+            now = time.monotonic()
+            if stage == last["stage"] and now - last["written"] < PROGRESS_INTERVAL_SECONDS:
+                return
+            last.update(stage=stage, written=now)
+            self._update(job_id, stage=stage, progress=json.dumps(detail, ensure_ascii=False))
+
+        def on_partial(output):
+            # The analysis so far, in the output language, for the page to show while it is written
+            now = time.monotonic()
+            if now - last["partial"] < PROGRESS_INTERVAL_SECONDS:
+                return
+            last["partial"] = now
+            self._update(job_id, partial=output)
+
+        self._update(job_id, status="running")
+        started = time.time()
+        try:
+            # The trace follows the job onto the pipeline's event loop and worker threads
+            with tracing() as trace:
+                result = self.pipeline.run(self.pipeline.process_document(
+                    data, selected_model, target_lang, on_progress=on_progress, file_name=file_name, direct=direct,
+                    on_partial=on_partial
+                ))
+            summary = {
+                "language": result["language"],
+                "analysis": result["analysis"],
+                "output": result["output"],
+                "seconds": round(time.time() - started, 3),
+                "trace": trace.to_dict(TRACE_MAX_SPANS),
+            }
+            self._update(
+                job_id, status="done", stage="done", result=json.dumps(summary, ensure_ascii=False), partial=None
+            )
+            count("jobs_total", status="done")
+            print(f"Job {job_id} finished in {summary['seconds']}s")
+        except Exception as e:
+            print(f"Job {job_id} failed: {str(e)}")
+            count("jobs_total", status="failed")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._futures.pop(job_id, None)
@@ -0,0 +1,120 @@
+import re
+from collections import Counter
+
+# Indic scripts each occupy one 128-codepoint Unicode block. Devanagari is
+# shared by Hindi and Marathi and is resolved separately.
+SCRIPT_BLOCKS = [
+    (0x0900, 'deva'),
+    (0x0980, 'bn'),
+    (0x0A00, 'pa'),
+    (0x0A80, 'gu'),
+    (0x0B00, 'or'),
+    (0x0B80, 'ta'),
+    (0x0C00, 'te'),
+    (0x0C80, 'kn'),
+    (0x0D00, 'ml'),
+]
+
+# Detections at or above this confidence are trusted without asking a model
+CONFIDENCE_THRESHOLD = 0.85
+
+# Small marker-word model for telling Hindi from Marathi. Weights favour words
+# that are frequent in one language and rare or absent in the other.
+HINDI_MARKERS = {
+    'है': 2, 'हैं': 2, 'और': 2, 'में': 2, 'नहीं': 2, 'यह': 1, 'वह': 1,
+    'का': 1, 'की': 1, 'के': 1, 'को': 1, 'से': 1, 'था': 1, 'थी': 1, 'थे': 1,
+    'किया': 1, 'गया': 1, 'गई': 1, 'लिए': 1, 'एवं': 1, 'कि': 1, 'भी': 1,
+}
+MARATHI_MARKERS = {
+    'आहे': 2, 'आहेत': 2, 'आणि': 2, 'नाही': 2, 'मध्ये': 2, 'हे': 1, 'ही': 1,
+    'व': 1, 'या': 1, 'असे': 1, 'असून': 1, 'होती': 1, 'केले': 1, 'केली': 1,
+    'झाले': 1, 'करण्यात': 2, 'पाहिजे': 1, 'त्याच्या': 1, 'म्हणून': 2,
+}
+MARATHI_SUFFIXES = ('च्या', 'ाचा', 'ाची', 'ाचे', 'ाला', 'ांना', 'ामध्ये')
+
+# Common English words; Latin text without them is likely romanised Indic text
+ENGLISH_STOPWORDS = {
+    'the', 'of', 'and', 'to', 'in', 'is', 'that', 'for', 'by', 'with', 'on',
+    'be', 'as', 'was', 'are', 'this', 'shall', 'or', 'an', 'at', 'from', 'not',
+}
+
+_DEVANAGARI_WORD = re.compile(r'[ऀ-ॿ]+')
+_LATIN_WORD = re.compile(r'[A-Za-z]+')
+
+
+def _build_script_table():
+    """Build a str.translate table mapping each script's codepoints to one tag character"""
+    table = {}
+    tags = {}
+    for index, (start, script) in enumerate(SCRIPT_BLOCKS):
+        tag = chr(0x41 + index)
+        tags[tag] = script
+        for codepoint in range(start, start + 0x80):
+            table[codepoint] = tag
+    for letter in 'abcdefghijklmnopqrstuvwxyz':
+        table[ord(letter)] = 'e'
+        table[ord(letter.upper())] = 'e'
+    tags['e'] = 'en'
+    return table, tags
+
+
+# Translating a sample through this table and counting tags builds the
+# histogram in C instead of a per-character Python loop
+_SCRIPT_TABLE, _SCRIPT_TAGS = _build_script_table()
+
+
+def detect_script_language(text, sample_size=2000):
+    """Detect language locally from a Unicode-block histogram; returns (code, confidence)"""
+    sample = text[:sample_size] if text else ""
+
+    # Characters outside the supported scripts (digits, punctuation, spaces) are ignored
+    histogram = Counter(sample.translate(_SCRIPT_TABLE))
+    scripts = Counter({_SCRIPT_TAGS[tag]: count for tag, count in histogram.items() if tag in _SCRIPT_TAGS})
+    if not scripts:
+        return 'en', 0.0
+
+    script, count = scripts.most_common(1)[0]
+    confidence = count / sum(scripts.values())
+
+    # Very short samples are not reliable enough to skip the model
+    if count < 20:
+        confidence *= count / 20
+
+    if script == 'deva':
+        lang, margin = _hindi_or_marathi(sample)
+        return lang, confidence * margin
+    if script == 'en':
+        return 'en', confidence * _english_likelihood(sample)
+    return script, confidence
+
+
+def _hindi_or_marathi(sample):
+    """Score Devanagari text against the Hindi and Marathi marker models"""
+    hindi_score = 0
+    marathi_score = sample.count('ळ')  # Retroflex LLA is common in Marathi, rare in Hindi
+
+    for word in _DEVANAGARI_WORD.findall(sample):
+        hindi_score += HINDI_MARKERS.get(word, 0)
+        marathi_score += MARATHI_MARKERS.get(word, 0)
+        if len(word) > 4 and word.endswith(MARATHI_SUFFIXES):
+            marathi_score += 1
+
+    evidence = hindi_score + marathi_score
+    if evidence == 0:
+        return 'hi', 0.5
+
+    lang = 'mr' if marathi_score > hindi_score else 'hi'
+    margin = abs(marathi_score - hindi_score) / evidence
+    # Require a few markers before trusting the margin
+    margin *= min(1.0, evidence / 10)
+    return lang, margin
+
+
+def _english_likelihood(sample):
+    """Return how strongly Latin text looks like English rather than romanised Indic text"""
+    words = [word.lower() for word in _LATIN_WORD.findall(sample)]
+    if not words:
+        return 0.0
+    stopword_ratio = sum(1 for word in words if word in ENGLISH_STOPWORDS) / len(words)
+    # Ordinary English prose has well over 15% stopwords
+    return min(1.0, stopword_ratio / 0.15)
@@ -1,54 +1,239 @@
-import google.generativeai as genai
-from model_manager import ModelManager
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from model_manager import get_model_manager
+from result_cache import ResultCache
+from translator import LANGUAGE_NAMES
+from utils import estimate_tokens, split_into_chunks
+from telemetry import span, bind_context, traced
+from statute_index import get_statute_index, format_excerpts
 
-class LegalAnalyzer:
-    def __init__(self):
-        # Initialize model manager
-        self.model_manager = ModelManager()
-    
-    def analyze_legal_document(self, text, selected_model="OpenAI (GPT-3.5)"):
-        """Analyze legal document using the selected AI model"""
-        client, model_type = self.model_manager.get_client(selected_model)
-        
-        # Check if text is too large and truncate if necessary
-        max_length = 4000  # Set a reasonable limit
-        if len(text) > max_length:
-            print(f"Warning: Text is too large ({len(text)} chars). Truncating to {max_length} chars.")
-            # Take the first part and the last part to capture important information
-            first_part = text[:max_length//2]
-            last_part = text[-max_length//2:]
-            text = first_part + "\n...[Content truncated due to length]...\n" + last_part
-        
-        prompt = """You are an Indian legal advisor. Analyze the provided legal document and provide a comprehensive analysis with the following sections:
+ANALYSIS_PROMPT = """You are an Indian legal advisor. Analyze the provided legal document and provide a comprehensive analysis with the following sections:
 
 1. 🧾 Case Summary: Explain what the case is about in simple language.
 2. 📜 Relevant Laws: List the relevant laws, sections, and precedents that apply to this case.
 3. 💡 Legal Advice: Provide practical advice for a common person dealing with this legal matter.
-4. 📈 Win Probability: Estimate the chance of winning this case (as a percentage) based on the information provided.
+4. 📈 Win Probability: Estimate the chance of winning this case (as a percentage) based on the information provided."""
+
+CHUNK_NOTES_PROMPT = """You are assisting an Indian legal advisor who will analyze a long legal document. You are given part {part} of the document. Write concise notes on this part only, covering:
+
+- Parties and their roles
+- Key facts and events, with dates
+- Claims, charges or reliefs sought
+- Laws, sections and precedents cited
+- Findings, orders and deadlines
+
+Only include information present in the text. Write "None" for anything not covered. Write the notes in English, whatever language the document is in."""
+
+REDUCE_PROMPT = ANALYSIS_PROMPT + """
+
+The document was too long to read at once, so you are given ordered notes on each of its parts. Base your analysis on the document as a whole."""
+
+DIRECT_PROMPT_SUFFIX = """
+
+The document is written in {source}. Read it in {source} and write the whole analysis in {target}, without translating the document first. Start each section on a new line with its number and emoji exactly as listed above, followed by the section title in {target}. Write the win probability as a percentage using Western digits, e.g. 65%."""
+
+STATUTE_PROMPT_SUFFIX = """
+
+These sections of Indian statutes matched the document in a search of the statute books:
+
+{excerpts}
+
+In the Relevant Laws section, cite the ones that apply by act and section, with one line each on why. Add other provisions only if the document clearly needs them. Offences committed from 1 July 2024 fall under the BNS and BNSS rather than the IPC and CrPC."""
+
+# Emoji marking each of the four sections, in the order the UI shows them
+ANALYSIS_SECTIONS = [
+    ("🧾", "Case Summary"),
+    ("📜", "Relevant Laws"),
+    ("💡", "Legal Advice"),
+    ("📈", "Win Probability"),
+]
+
+ANALYSIS_OPTIONS = {
+    "openai_model": "gpt-3.5-turbo-16k",  # Use a model with larger context window if available
+    "temperature": 0.5,
+    "max_tokens": 2000,
+}
+
+# Notes on all chunks must fit the reduce call alongside the prompt and the answer
+REDUCE_TOKEN_BUDGET = 12000
+
+def parse_analysis_sections(analysis):
+    """Return {emoji: (title, body)} for the numbered emoji sections found in an analysis"""
+    markers = "|".join(emoji for emoji, _ in ANALYSIS_SECTIONS)
+    # A section starts with its emoji, optionally numbered and bolded, then its title up to a colon
+    pattern = re.compile(r'^[ \t#*]*(?:\d+\.)?[ \t*]*(' + markers + r')([^\n:]*):?[ \t*]*', re.MULTILINE)
+    matches = list(pattern.finditer(analysis))
+    sections = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(analysis)
+        body = analysis[match.end():end].strip()
+        if match.group(1) not in sections:
+            sections[match.group(1)] = (match.group(2).strip(" \t*#"), body)
+    return sections
+
+def normalize_analysis(analysis):
+    """Rebuild an analysis as the four numbered emoji sections, in order, with Western digits"""
+    # Models writing in Indian languages sometimes use native digits, which the
+    # win probability parser does not read
+    analysis = "".join(
+        str(unicodedata.digit(ch)) if ch.isdigit() and not ch.isascii() else ch for ch in analysis
+    )
+    sections = parse_analysis_sections(analysis)
+    if not sections:
+        return analysis.strip()
+
+    parts = []
+    for number, (emoji, default_title) in enumerate(ANALYSIS_SECTIONS, start=1):
+        title, body = sections.get(emoji, (default_title, "Not provided."))
+        # Keep a list that started on the line after the title as a list
+        separator = "\n" if re.match(r'[-*•]|\d+\.', body) else " "
+        parts.append(f"{number}. {emoji} {title or default_title}:{separator}{body}")
+    return "\n\n".join(parts)
+
+def join_chunk_notes(chunk_notes):
+    """Label each chunk's notes with its position and join them in document order"""
+    return "\n\n".join(
+        f"[Part {i + 1} of {len(chunk_notes)}]\n{note}" for i, note in enumerate(chunk_notes)
+    )
+
+def _is_direct(source_lang, target_lang):
+    """Return True if an analysis reads or writes a language other than English"""
+    return source_lang != "en" or target_lang != "en"
+
+def direct_prompt_suffix(source_lang, target_lang):
+    """Return the instructions added to the analysis prompt for a direct analysis, or "" for English"""
+    if not _is_direct(source_lang, target_lang):
+        return ""
+    return DIRECT_PROMPT_SUFFIX.format(
+        source=LANGUAGE_NAMES.get(source_lang, source_lang),
+        target=LANGUAGE_NAMES.get(target_lang, target_lang)
+    )
+
+class LegalAnalyzer:
+    def __init__(self, chunk_tokens=None, max_workers=None, model_manager=None, statute_index=None):
+        # Share the process-wide model manager and its pooled clients
+        self.model_manager = model_manager or get_model_manager()
+        # Analyses are cached by document text and model
+        self.cache = ResultCache()
+
+        # Documents over the chunk budget are analyzed in parallel chunks, with at most
+        # max_workers requests in flight to stay under provider rate limits
+        self.chunk_tokens = chunk_tokens or int(os.getenv("ANALYSIS_CHUNK_TOKENS", "3000"))
+        self.max_workers = max_workers or int(os.getenv("ANALYSIS_MAX_WORKERS", "4"))
+
+        # Sections found in the bundled statute index ground the Relevant Laws section
+        self.statute_index = statute_index or get_statute_index()
+        self.statute_sections = int(os.getenv("STATUTE_LOOKUP_SECTIONS", "6"))
+
+    def analyze_legal_document(self, text, selected_model="OpenAI (GPT-3.5)", source_lang="en", target_lang="en"):
+        """Analyze legal document using the selected AI model"""
+        # With a non-English source or target, the document is read in its own language and
+        # the analysis written in the target language in one pass, skipping both translations
+
+        # Fail early on an unknown model rather than reporting it as an analysis error
+        self.model_manager.get_client(selected_model)
 
-Note: The document may be truncated due to length. Focus on analyzing the visible portions."""
-        
         try:
-            if model_type == "openai":
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo-16k",  # Use a model with larger context window if available
-                    messages=[
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0.5,
-                    max_tokens=2000
-                )
-                return response.choices[0].message.content
-            
-            elif model_type == "gemini":
-                gemini_model = genai.GenerativeModel('gemini-pro')
-                response = gemini_model.generate_content([
-                    prompt,
-                    text
-                ])
-                return response.text
-            
+            return self.cache.get_or_compute(
+                "analyze", self._cache_key(text, selected_model, source_lang, target_lang),
+                lambda: self._analyze(text, selected_model, source_lang, target_lang)
+            )
         except Exception as e:
             print(f"Legal analysis error: {str(e)}")
-            return f"Error analyzing document: {str(e)}"
\ No newline at end of file
+            return f"Error analyzing document: {str(e)}"
+
+    def stream_legal_document(self, text, selected_model="OpenAI (GPT-3.5)", source_lang="en", target_lang="en",
+                              notes=None):
+        """Analyze legal document, yielding the analysis in pieces as the model writes it; returns the analysis"""
+        # Errors are raised rather than yielded, since part of the analysis may already be
+        # shown. Callers that have already written notes on the document's chunks pass them
+        self.model_manager.get_client(selected_model)
+
+        key = self._cache_key(text, selected_model, source_lang, target_lang)
+        cached = self.cache.get("analyze", key)
+        if cached is not None:
+            print("Result cache hit: analyze")
+            yield cached
+            return cached
+
+        # Long documents are condensed first; only the final analysis is streamed
+        prompt, content = self._prepare_analysis(text, selected_model, source_lang, target_lang, notes)
+        parts = []
+        for piece in self.model_manager.generate_stream(selected_model, prompt, content, **ANALYSIS_OPTIONS):
+            parts.append(piece)
+            yield piece
+
+        # Only cache analyses that streamed to completion
+        analysis = "".join(parts)
+        if _is_direct(source_lang, target_lang):
+            analysis = normalize_analysis(analysis)
+        self.cache.set("analyze", key, analysis)
+        return analysis
+
+    def _cache_key(self, text, selected_model, source_lang="en", target_lang="en"):
+        """Return the result cache key for an analysis"""
+        key = [self.cache.hash_content(text), selected_model, self.chunk_tokens]
+        if _is_direct(source_lang, target_lang):
+            key += ["direct", source_lang, target_lang]
+        if self.statute_index is not None:
+            key += ["statutes", self.statute_index.build_id, self.statute_sections]
+        return key
+
+    def statute_prompt(self, text):
+        """Return the statute sections matching text as an addition to the analysis prompt, or "" if none"""
+        if self.statute_index is None or not self.statute_sections:
+            return ""
+        with span("statute_lookup") as attributes:
+            sections = self.statute_index.search(text, self.statute_sections)
+            attributes["sections"] = len(sections)
+        if not sections:
+            return ""
+        print(f"Statute lookup found {len(sections)} sections")
+        return STATUTE_PROMPT_SUFFIX.format(excerpts=format_excerpts(sections))
+
+    @traced("analyze")
+    def _analyze(self, text, selected_model, source_lang="en", target_lang="en"):
+        """Analyze short documents in one call and long ones with map-reduce over chunks"""
+        prompt, content = self._prepare_analysis(text, selected_model, source_lang, target_lang)
+        analysis = self.model_manager.generate(selected_model, prompt, content, **ANALYSIS_OPTIONS)
+        if _is_direct(source_lang, target_lang):
+            analysis = normalize_analysis(analysis)
+        return analysis
+
+    def _prepare_analysis(self, text, selected_model, source_lang="en", target_lang="en", notes=None):
+        """Return the prompt and content for the final analysis call, condensing long documents first"""
+        if notes is None:
+            if estimate_tokens(text) <= self.chunk_tokens:
+                return ANALYSIS_PROMPT + self.statute_prompt(text) + direct_prompt_suffix(source_lang, target_lang), text
+            notes = self._collect_notes(text, selected_model)
+
+        # Very long documents produce notes too long for one call; condense them again
+        while estimate_tokens(notes) > REDUCE_TOKEN_BUDGET:
+            condensed = self._collect_notes(notes, selected_model)
+            if estimate_tokens(condensed) >= estimate_tokens(notes):
+                break  # Stop if another pass no longer shrinks the notes
+            notes = condensed
+
+        # Chunk notes are written in English, so the reduce call reads English
+        return REDUCE_PROMPT + self.statute_prompt(text) + direct_prompt_suffix("en", target_lang), notes
+
+    def _collect_notes(self, text, selected_model):
+        """Split text into chunks and join the notes on each chunk in document order"""
+        chunks = split_into_chunks(text, self.chunk_tokens)
+        print(f"Analyzing {len(chunks)} chunks with up to {self.max_workers} concurrent requests")
+        return join_chunk_notes(self._summarize_chunks(chunks, selected_model))
+
+    def _summarize_chunks(self, chunks, selected_model):
+        """Write notes on every chunk concurrently, returned in document order"""
+        def summarize(indexed_chunk):
+            index, chunk = indexed_chunk
+            prompt = CHUNK_NOTES_PROMPT.format(part=index + 1)
+            with span("analyze_chunk", part=index + 1):
+                return self.model_manager.generate(
+                    selected_model, prompt, chunk, temperature=0.2, max_tokens=500
+                )
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            return list(pool.map(bind_context(summarize), enumerate(chunks)))
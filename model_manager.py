@@ -1,7 +1,27 @@
 import os
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from openai import OpenAI
-import google.generativeai as genai
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, is_retryable, retry_delay
+from telemetry import bind_context, count, record_model_call, record_usage
+
+# Provider SDKs take over a second to import, so each one is imported the first
+# time its provider is used rather than at startup
+
+_shared_manager = None
+_shared_manager_lock = threading.Lock()
+
+def get_model_manager():
+    """Return the process-wide ModelManager, creating it on first use"""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_manager_lock:
+            if _shared_manager is None:
+                _shared_manager = ModelManager()
+    return _shared_manager
 
 class ModelManager:
     def __init__(self):
@@ -12,25 +32,96 @@ class ModelManager:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.gemini_api_key = os.getenv("GEMINI_API_KEY")
         
-        # Initialize clients
-        self.openai_client = None
-        if self.openai_api_key:
-            try:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
-                print("OpenAI client initialized")
-            except Exception as e:
-                print(f"Error initializing OpenAI client: {str(e)}")
+        # Connection pool and timeout settings shared by every request
+        self.pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+        self.request_timeout = float(os.getenv("HTTP_TIMEOUT", "60"))
+        self.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
         
-        if self.gemini_api_key:
-            try:
-                genai.configure(api_key=self.gemini_api_key)
-                print("Gemini client initialized")
-                self.gemini_available = True
-            except Exception as e:
-                print(f"Error initializing Gemini client: {str(e)}")
-                self.gemini_available = False
-        else:
-            self.gemini_available = False
+        # Gemini model objects are built once per model name and reused
+        self._gemini_models = {}
+        self._gemini_lock = threading.Lock()
+        self._gemini_configured = False
+        self.gemini_available = bool(self.gemini_api_key)
+        # A different Gemini endpoint, e.g. a local stand-in, is reached over REST
+        self.gemini_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        
+        # Clients are created on first use of their provider
+        self._openai_client = None
+        self._openai_lock = threading.Lock()
+        
+        # Async clients hold connections bound to one event loop, so keep one per loop
+        self._async_openai_clients = weakref.WeakKeyDictionary()
+        
+        # Every call has a timeout and is retried with jittered backoff when the error is transient
+        self.call_timeout = float(os.getenv("MODEL_CALL_TIMEOUT", str(self.request_timeout)))
+        self.max_retries = int(os.getenv("MODEL_MAX_RETRIES", "2"))
+        self.retry_base = float(os.getenv("MODEL_RETRY_BASE_SECONDS", "0.5"))
+        # A provider that keeps failing is skipped for a while, and calls fail over to the other one
+        self.breakers = {
+            provider: CircuitBreaker(
+                int(os.getenv("MODEL_BREAKER_FAILURES", "5")),
+                float(os.getenv("MODEL_BREAKER_RESET_SECONDS", "30"))
+            )
+            for provider in ("openai", "gemini")
+        }
+        self.failover = os.getenv("MODEL_FAILOVER", "1").lower() in ("1", "true", "yes")
+        # With hedging, a call still unanswered after the provider's usual (p95) latency is
+        # also sent to the other provider, and whichever answers first wins
+        self.hedging = os.getenv("MODEL_HEDGING", "").lower() in ("1", "true", "yes")
+        self.hedge_percentile = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+        self.hedge_min_samples = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", "20"))
+        self.latency = {"openai": LatencyTracker(), "gemini": LatencyTracker()}
+        self._hedge_pool = None
+        self._hedge_pool_lock = threading.Lock()
+    
+    @property
+    def openai_client(self):
+        """The pooled OpenAI client, created on first use; None without an API key"""
+        if self._openai_client is None and self.openai_api_key:
+            with self._openai_lock:
+                if self._openai_client is None:
+                    try:
+                        from openai import OpenAI
+                        # Retries are handled by the call layer below, not by the SDK
+                        self._openai_client = OpenAI(
+                            api_key=self.openai_api_key, http_client=self._http_client(), max_retries=0
+                        )
+                        print("OpenAI client initialized")
+                    except Exception as e:
+                        print(f"Error initializing OpenAI client: {str(e)}")
+        return self._openai_client
+    
+    def _http_client(self, asynchronous=False):
+        """Return an httpx client with the shared pool limits and timeouts"""
+        import httpx
+        # Keep-alive connections are pooled so requests skip the TLS handshake
+        client_class = httpx.AsyncClient if asynchronous else httpx.Client
+        return client_class(
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size
+            ),
+            timeout=httpx.Timeout(self.request_timeout, connect=self.connect_timeout)
+        )
+    
+    def _genai(self):
+        """Import and configure the Gemini SDK on first use"""
+        import google.generativeai as genai
+        if not self._gemini_configured:
+            with self._gemini_lock:
+                if not self._gemini_configured:
+                    try:
+                        options = {}
+                        if self.gemini_endpoint:
+                            options = {"transport": "rest", "client_options": {"api_endpoint": self.gemini_endpoint}}
+                        genai.configure(api_key=self.gemini_api_key, **options)
+                        print("Gemini client initialized")
+                    except Exception as e:
+                        print(f"Error initializing Gemini client: {str(e)}")
+                        self.gemini_available = False
+                        raise
+                    self._gemini_configured = True
+        return genai
     
     def get_available_models(self):
         """Return a list of available models"""
@@ -48,4 +139,387 @@ class ModelManager:
         elif "Gemini" in model_name:
             return None, "gemini"  # Gemini uses a different approach
         else:
-            raise ValueError(f"Unknown model: {model_name}")
\ No newline at end of file
+            raise ValueError(f"Unknown model: {model_name}")
+    
+    def get_async_openai_client(self):
+        """Return a pooled AsyncOpenAI client for the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._async_openai_clients.get(loop)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(
+                api_key=self.openai_api_key, http_client=self._http_client(asynchronous=True), max_retries=0
+            )
+            self._async_openai_clients[loop] = client
+        return client
+    
+    def get_gemini_model(self, model_name="gemini-pro"):
+        """Return a cached Gemini GenerativeModel for the given model name"""
+        model = self._gemini_models.get(model_name)
+        if model is None:
+            genai = self._genai()
+            with self._gemini_lock:
+                model = self._gemini_models.get(model_name)
+                if model is None:
+                    model = genai.GenerativeModel(model_name)
+                    self._gemini_models[model_name] = model
+        return model
+    
+    def get_provider_status(self):
+        """Return each configured provider's circuit breaker state and recent p95 latency"""
+        return {
+            provider: {
+                "circuit": self.breakers[provider].state,
+                "p95_seconds": self.latency[provider].percentile(95),
+                "samples": len(self.latency[provider]),
+            }
+            for provider in ("openai", "gemini") if self._is_configured(provider)
+        }
+    
+    def generate(self, selected_model, system_prompt, user_content, openai_model="gpt-3.5-turbo",
+                 gemini_model="gemini-pro", temperature=0.3, max_tokens=2000, timeout=None):
+        """Send a system prompt and user content to the selected provider and return the reply text"""
+        request = self._request(system_prompt, user_content, openai_model, gemini_model, temperature, max_tokens, timeout)
+        primary, fallback = self._route(selected_model)
+        
+        def run(provider):
+            return self.call_with_retries(provider, lambda: self._generate_once(provider, **request))
+        
+        delay = self._hedge_delay(primary, fallback)
+        if delay is not None:
+            return self._hedged(primary, fallback, run, delay)
+        try:
+            return run(primary)
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"{primary} failed ({type(e).__name__}: {str(e)}), failing over to {fallback}")
+            count("model_failovers_total", provider=fallback)
+            return run(fallback)
+    
+    def generate_stream(self, selected_model, system_prompt, user_content, openai_model="gpt-3.5-turbo",
+                        gemini_model="gemini-pro", temperature=0.3, max_tokens=2000, timeout=None):
+        """Like generate, but yield the reply text in pieces as the provider streams it"""
+        request = self._request(system_prompt, user_content, openai_model, gemini_model, temperature, max_tokens, timeout)
+        primary, fallback = self._route(selected_model)
+        
+        # Once pieces have been shown the reply cannot be retried or failed over
+        streamed = False
+        try:
+            for piece in self._stream_with_retries(primary, request):
+                streamed = True
+                yield piece
+        except Exception as e:
+            if streamed or not fallback:
+                raise
+            print(f"{primary} failed ({type(e).__name__}: {str(e)}), failing over to {fallback}")
+            count("model_failovers_total", provider=fallback)
+            yield from self._stream_with_retries(fallback, request)
+    
+    async def agenerate(self, selected_model, system_prompt, user_content, openai_model="gpt-3.5-turbo",
+                        gemini_model="gemini-pro", temperature=0.3, max_tokens=2000, timeout=None):
+        """Async version of generate, using the async OpenAI client and Gemini async generation"""
+        request = self._request(system_prompt, user_content, openai_model, gemini_model, temperature, max_tokens, timeout)
+        primary, fallback = self._route(selected_model)
+        
+        def run(provider):
+            return self._awith_retries(provider, lambda: self._agenerate_once(provider, **request))
+        
+        delay = self._hedge_delay(primary, fallback)
+        if delay is not None:
+            return await self._ahedged(primary, fallback, run, delay)
+        try:
+            return await run(primary)
+        except Exception as e:
+            if not fallback:
+                raise
+            print(f"{primary} failed ({type(e).__name__}: {str(e)}), failing over to {fallback}")
+            count("model_failovers_total", provider=fallback)
+            return await run(fallback)
+    
+    def _request(self, system_prompt, user_content, openai_model, gemini_model, temperature, max_tokens, timeout):
+        """Bundle a call's arguments so the same request can be sent to either provider"""
+        return {
+            "system_prompt": system_prompt,
+            "user_content": user_content,
+            "openai_model": openai_model,
+            "gemini_model": gemini_model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "timeout": timeout or self.call_timeout,
+        }
+    
+    def _is_configured(self, provider):
+        """Return True if a provider has credentials"""
+        if provider == "openai":
+            return bool(self.openai_api_key)
+        return bool(self.gemini_api_key) and self.gemini_available
+    
+    def _route(self, selected_model):
+        """Return the selected provider and the provider to fail over to, if any"""
+        _, primary = self.get_client(selected_model)
+        fallback = "gemini" if primary == "openai" else "openai"
+        if not self.failover or not self._is_configured(fallback):
+            fallback = None
+        return primary, fallback
+    
+    def _record_error(self, provider, error):
+        """Count a transient error against the provider's breaker; other errors mean it did answer"""
+        if is_retryable(error):
+            self.breakers[provider].record_failure()
+        else:
+            self.breakers[provider].record_success()
+    
+    def _check_breaker(self, provider):
+        """Raise CircuitOpenError if the provider's breaker is not letting calls through"""
+        if not self.breakers[provider].allow():
+            raise CircuitOpenError(f"{provider} is failing; its circuit breaker is open")
+    
+    def call_with_retries(self, provider, call):
+        """Run a call against a provider, retrying transient errors with jittered backoff"""
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(provider)
+            started = time.monotonic()
+            try:
+                result = call()
+            except Exception as e:
+                record_model_call(provider, time.monotonic() - started, "error")
+                self._record_error(provider, e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt, self.retry_base)
+                print(f"{provider} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                count("model_retries_total", provider=provider)
+                time.sleep(delay)
+                continue
+            elapsed = time.monotonic() - started
+            record_model_call(provider, elapsed)
+            self.breakers[provider].record_success()
+            self.latency[provider].record(elapsed)
+            return result
+    
+    async def _awith_retries(self, provider, call):
+        """Async version of call_with_retries"""
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(provider)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                # A hedged call that lost the race; it says nothing about the provider
+                record_model_call(provider, time.monotonic() - started, "cancelled")
+                self.breakers[provider].release()
+                raise
+            except Exception as e:
+                record_model_call(provider, time.monotonic() - started, "error")
+                self._record_error(provider, e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt, self.retry_base)
+                print(f"{provider} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                count("model_retries_total", provider=provider)
+                await asyncio.sleep(delay)
+                continue
+            elapsed = time.monotonic() - started
+            record_model_call(provider, elapsed)
+            self.breakers[provider].record_success()
+            self.latency[provider].record(elapsed)
+            return result
+    
+    def _stream_with_retries(self, provider, request):
+        """Stream a reply from a provider, retrying transient errors that happen before the first piece"""
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker(provider)
+            streamed = False
+            started = time.monotonic()
+            try:
+                for piece in self._stream_once(provider, **request):
+                    streamed = True
+                    yield piece
+            except GeneratorExit:
+                # The reader stopped early; like a cancelled call, it says nothing about the provider
+                record_model_call(provider, time.monotonic() - started, "cancelled")
+                self.breakers[provider].release()
+                raise
+            except Exception as e:
+                record_model_call(provider, time.monotonic() - started, "error")
+                self._record_error(provider, e)
+                if streamed or attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt, self.retry_base)
+                print(f"{provider} stream failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                count("model_retries_total", provider=provider)
+                time.sleep(delay)
+                continue
+            record_model_call(provider, time.monotonic() - started)
+            self.breakers[provider].record_success()
+            return
+    
+    def _hedge_delay(self, primary, fallback):
+        """Return how long to wait before hedging a call, or None if it should not be hedged"""
+        if not self.hedging or not fallback:
+            return None
+        # Until enough calls have been timed there is no reliable p95 to hedge after
+        return self.latency[primary].percentile(self.hedge_percentile, self.hedge_min_samples)
+    
+    def _hedged(self, primary, fallback, run, delay):
+        """Run a call on the primary provider, also sending it to the fallback if it is slow"""
+        if self._hedge_pool is None:
+            with self._hedge_pool_lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_size * 2)
+        
+        # Pool threads record their calls under the caller's stage and trace
+        first = self._hedge_pool.submit(bind_context(run), primary)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            if first.exception() is None:
+                return first.result()
+            print(f"{primary} failed ({type(first.exception()).__name__}), failing over to {fallback}")
+            count("model_failovers_total", provider=fallback)
+            return run(fallback)
+        
+        print(f"No reply from {primary} after {delay:.1f}s, hedging with {fallback}")
+        count("model_hedges_total", provider=fallback)
+        pending = {first, self._hedge_pool.submit(bind_context(run), fallback)}
+        error = None
+        while pending:
+            # The slower call is left to finish in the background
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    async def _ahedged(self, primary, fallback, run, delay):
+        """Async version of _hedged; the slower call is cancelled"""
+        first = asyncio.ensure_future(run(primary))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            if first.exception() is None:
+                return first.result()
+            print(f"{primary} failed ({type(first.exception()).__name__}), failing over to {fallback}")
+            count("model_failovers_total", provider=fallback)
+            return await run(fallback)
+        
+        print(f"No reply from {primary} after {delay:.1f}s, hedging with {fallback}")
+        count("model_hedges_total", provider=fallback)
+        pending = {first, asyncio.ensure_future(run(fallback))}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    @staticmethod
+    def _request_bytes(system_prompt, user_content):
+        """Return the size of a text request's prompt and content in bytes"""
+        return len(system_prompt.encode("utf-8")) + len(user_content.encode("utf-8"))
+    
+    def _messages(self, system_prompt, user_content):
+        """Return the chat messages for a system prompt and user content"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ]
+    
+    def _generate_once(self, provider, system_prompt, user_content, openai_model, gemini_model,
+                       temperature, max_tokens, timeout):
+        """Make a single generation request to a provider"""
+        if provider == "openai":
+            if self.openai_client is None:
+                raise RuntimeError("OpenAI client is not available")
+            response = self.openai_client.chat.completions.create(
+                model=openai_model,
+                messages=self._messages(system_prompt, user_content),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout
+            )
+            record_usage(provider, self._request_bytes(system_prompt, user_content), response)
+            return response.choices[0].message.content
+        
+        model = self.get_gemini_model(gemini_model)
+        response = model.generate_content(
+            [system_prompt, user_content],
+            generation_config={"temperature": temperature, "max_output_tokens": max_tokens},
+            request_options={"timeout": timeout}
+        )
+        record_usage(provider, self._request_bytes(system_prompt, user_content), response)
+        return response.text
+    
+    def _stream_once(self, provider, system_prompt, user_content, openai_model, gemini_model,
+                     temperature, max_tokens, timeout):
+        """Make a single streaming request to a provider, yielding text pieces"""
+        if provider == "openai":
+            if self.openai_client is None:
+                raise RuntimeError("OpenAI client is not available")
+            response = self.openai_client.chat.completions.create(
+                model=openai_model,
+                messages=self._messages(system_prompt, user_content),
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                # The last chunk then carries the token counts
+                stream_options={"include_usage": True},
+                timeout=timeout
+            )
+            usage = None
+            for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk
+            record_usage(provider, self._request_bytes(system_prompt, user_content), usage)
+            return
+        
+        model = self.get_gemini_model(gemini_model)
+        response = model.generate_content(
+            [system_prompt, user_content],
+            generation_config={"temperature": temperature, "max_output_tokens": max_tokens},
+            stream=True,
+            request_options={"timeout": timeout}
+        )
+        chunk = None
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        record_usage(provider, self._request_bytes(system_prompt, user_content), chunk)
+    
+    async def _agenerate_once(self, provider, system_prompt, user_content, openai_model, gemini_model,
+                              temperature, max_tokens, timeout):
+        """Make a single async generation request to a provider, bounded by the call timeout"""
+        if provider == "openai":
+            response = await asyncio.wait_for(
+                self.get_async_openai_client().chat.completions.create(
+                    model=openai_model,
+                    messages=self._messages(system_prompt, user_content),
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                timeout
+            )
+            record_usage(provider, self._request_bytes(system_prompt, user_content), response)
+            return response.choices[0].message.content
+        
+        model = self.get_gemini_model(gemini_model)
+        request = {
+            "generation_config": {"temperature": temperature, "max_output_tokens": max_tokens},
+            "request_options": {"timeout": timeout},
+        }
+        if self.gemini_endpoint:
+            # The REST transport has no async client
+            call = asyncio.to_thread(model.generate_content, [system_prompt, user_content], **request)
+        else:
+            call = model.generate_content_async([system_prompt, user_content], **request)
+        response = await asyncio.wait_for(call, timeout)
+        record_usage(provider, self._request_bytes(system_prompt, user_content), response)
+        return response.text
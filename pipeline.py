@@ -0,0 +1,434 @@
+import os
+import time
+import asyncio
+import threading
+from document_processor import (
+    DocumentProcessor, IMAGE_EXTENSIONS, SUPPORTED_EXTENSIONS, LANGUAGE_DETECTION_PROMPT, normalize_language_code
+)
+from translator import Translator, TranslationJob
+from legal_analyzer import (
+    LegalAnalyzer, ANALYSIS_PROMPT, REDUCE_PROMPT, CHUNK_NOTES_PROMPT, ANALYSIS_OPTIONS,
+    REDUCE_TOKEN_BUDGET, join_chunk_notes, direct_prompt_suffix, normalize_analysis
+)
+from language_detector import detect_script_language, CONFIDENCE_THRESHOLD
+from text_cleaner import BoilerplateFilter
+from document_source import open_source, source_extension, file_size
+from utils import estimate_tokens, split_into_chunks
+from telemetry import span, count, traced
+
+_PAGES_DONE = object()
+
+
+class TokenBucket:
+    """Async token-bucket rate limiter allowing short bursts up to its capacity"""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        # By default allow about one second's worth of requests as a burst
+        self.capacity = capacity or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount=1.0):
+        """Wait until the bucket holds enough tokens, then take them"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class DocumentPipeline:
+    """Async extract -> detect -> translate -> analyze engine that overlaps stages where it can"""
+
+    def __init__(self, document_processor=None, translator=None, legal_analyzer=None, max_concurrency=None):
+        self.document_processor = document_processor or DocumentProcessor()
+        self.translator = translator or Translator()
+        self.legal_analyzer = legal_analyzer or LegalAnalyzer()
+        self.model_manager = self.document_processor.model_manager
+
+        # Each provider gets its own cap on in-flight requests and its own request rate
+        self.max_concurrency = max_concurrency or int(os.getenv("PIPELINE_MAX_CONCURRENCY", "8"))
+        self.requests_per_minute = {
+            "openai": float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+            "gemini": float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60")),
+        }
+        # Semaphores and buckets only work on the event loop they were made on, so each loop
+        # (the pipeline's own, or one from asyncio.run) gets its own
+        self._limits = {}
+
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def run(self, coroutine):
+        """Run a coroutine on the pipeline's background event loop and wait for its result"""
+        with self._loop_lock:
+            if self._loop is None:
+                # One long-lived loop lets every caller share clients, semaphores and rate limits
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="document-pipeline", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def process_document(self, source, selected_model="OpenAI (GPT-3.5)", target_lang="en", on_progress=None,
+                               file_name=None, direct=False, on_partial=None):
+        """Extract, detect, translate and analyze one document; returns a dict of stage results"""
+        # In direct mode nothing is translated; the analysis reads the original language
+        # and is written in the target language. on_partial, if given, is called with the
+        # output written so far while the analysis streams in
+        def report(stage, **detail):
+            if on_progress:
+                on_progress(stage, detail)
+
+        # Fail early on an unknown model
+        self.model_manager.get_client(selected_model)
+
+        # Like DocumentProcessor, the document may be a path or an in-memory upload named by file_name
+        file_extension = source_extension(source, file_name)
+        if file_extension not in SUPPORTED_EXTENSIONS:
+            raise ValueError(f"Unsupported file format: {file_extension}")
+        chunk_tokens = self.legal_analyzer.chunk_tokens
+        # Filled in with the document's page count and cleanup savings as extraction learns them
+        extract_info = {}
+
+        if file_extension in IMAGE_EXTENSIONS:
+            # Vision OCR returns the text and its language together
+            text, lang = await asyncio.to_thread(
+                self.document_processor.extract_text_and_detect_language, source, selected_model, file_name=file_name
+            )
+            pages = _single_page(text)
+        else:
+            lang = None
+            pages = self._iter_pages(source, file_extension, selected_model, extract_info)
+
+        # Chunks are translated and, once the document is known to need map-reduce,
+        # summarized while later pages are still being extracted
+        chunk_tasks = []
+        page_texts = []
+        buffer = ""
+        async for page_text in pages:
+            page_texts.append(page_text)
+            report("extract", page=len(page_texts), pages=extract_info.get("total"))
+            buffer += page_text + "\n"
+
+            if lang is None and len(buffer) >= 2000:
+                lang = await self._detect_language(buffer, selected_model)
+                report("detect", language=lang)
+
+            if lang is not None and estimate_tokens(buffer) > chunk_tokens:
+                chunks = split_into_chunks(buffer, chunk_tokens)
+                # Keep the tail in the buffer; the next page may continue it
+                buffer = chunks.pop() if chunks else ""
+                for chunk in chunks:
+                    chunk_tasks.append(asyncio.create_task(
+                        self._process_chunk(len(chunk_tasks), chunk, lang, selected_model, True, report, not direct)
+                    ))
+
+        text = page_texts[0] if file_extension in IMAGE_EXTENSIONS else "".join(t + "\n" for t in page_texts)
+        if "cleanup" in extract_info:
+            # Page offsets are kept with the cached text for the viewer, not reported as progress
+            report("clean", **{name: value for name, value in extract_info["cleanup"].items() if name != "page_starts"})
+        if lang is None:
+            lang = await self._detect_language(text, selected_model)
+            report("detect", language=lang)
+
+        if buffer.strip():
+            # A document that never filled a chunk is analyzed in a single call
+            chunk_tasks.append(asyncio.create_task(
+                self._process_chunk(len(chunk_tasks), buffer, lang, selected_model, bool(chunk_tasks), report, not direct)
+            ))
+
+        results = await asyncio.gather(*chunk_tasks)
+        chunk_notes = [notes for _, notes in results if notes is not None]
+        translate_to = target_lang if target_lang != "en" and not direct else None
+        if direct:
+            english_text = None
+            analysis, output = await self._analyze(
+                text, chunk_notes, selected_model, lang, target_lang, on_partial=on_partial
+            )
+        else:
+            english_text = text if lang == "en" else "\n".join(english for english, _ in results)
+            analysis, output = await self._analyze(
+                english_text, chunk_notes, selected_model, translate_to=translate_to, on_partial=on_partial
+            )
+        report("analyze")
+
+        if translate_to:
+            if output is None:
+                output = await self._translate(analysis, "en", target_lang, selected_model, cache_stage="translate_target")
+            report("translate_output", language=target_lang)
+
+        return {
+            "text": text,
+            "language": lang,
+            "english_text": english_text,
+            "analysis": analysis,
+            "output": output,
+        }
+
+    async def _iter_pages(self, source, file_extension, selected_model, extract_info):
+        """Yield cleaned page texts as they are extracted, reusing cached extraction when available"""
+        cache = self.document_processor.cache
+        with open_source(source) as file:
+            doc_hash = await asyncio.to_thread(cache.hash_stream, file)
+            count("document_bytes_total", file_size(file))
+            # Scanned PDF pages are read with the selected model, so it is part of the key
+            key = [doc_hash, selected_model] if file_extension == '.pdf' else [doc_hash]
+            cached = cache.get("extract_clean", key)
+            if cached is not None:
+                text, extract_info["cleanup"] = cached
+                # Extracted text ends with the newline that rejoining the pages adds back
+                yield text[:-1] if text.endswith("\n") else text
+                return
+
+            # Pages, or sections of a Word document, are extracted on a worker thread
+            # and handed over one at a time
+            loop = asyncio.get_running_loop()
+            queue = asyncio.Queue()
+
+            def produce():
+                try:
+                    with span("extract", format=file_extension):
+                        def on_page(done, total):
+                            extract_info["total"] = total
+
+                        if file_extension == '.pdf':
+                            page_iter = self.document_processor.iter_pdf_pages(source, selected_model, on_page, file)
+                        else:
+                            page_iter = self.document_processor.iter_word_sections(file)
+                        # Headers and footers are learned from the first pages, then dropped as pages arrive
+                        cleaner = BoilerplateFilter(repeated_lines=file_extension == '.pdf')
+                        for page_text in page_iter:
+                            for cleaned in cleaner.feed(page_text):
+                                loop.call_soon_threadsafe(queue.put_nowait, cleaned)
+                        for cleaned in cleaner.finish():
+                            loop.call_soon_threadsafe(queue.put_nowait, cleaned)
+                        extract_info["cleanup"] = cleaner.summary()
+                        extract_info["cleanup"]["page_starts"] = cleaner.page_starts
+                finally:
+                    loop.call_soon_threadsafe(queue.put_nowait, _PAGES_DONE)
+
+            producer = asyncio.create_task(asyncio.to_thread(produce))
+            page_texts = []
+            while True:
+                page_text = await queue.get()
+                if page_text is _PAGES_DONE:
+                    break
+                page_texts.append(page_text)
+                yield page_text
+
+            await producer  # Re-raise any extraction error
+            cache.set("extract_clean", key, ["".join(t + "\n" for t in page_texts), extract_info["cleanup"]])
+
+    async def _process_chunk(self, index, chunk, lang, selected_model, with_notes, report, translate=True):
+        """Translate one chunk to English and, for map-reduce analysis, write notes on it"""
+        english = chunk
+        if lang != "en" and translate:
+            english = await self._translate(chunk, lang, "en", selected_model)
+        report("translate", chunk=index + 1)
+
+        notes = None
+        if with_notes:
+            cache = self.legal_analyzer.cache
+            key = [cache.hash_content(english), index, selected_model]
+            notes = cache.get("chunk_notes", key)
+            if notes is None:
+                with span("analyze_chunk", part=index + 1):
+                    notes = await self._call(
+                        selected_model, CHUNK_NOTES_PROMPT.format(part=index + 1), english, temperature=0.2, max_tokens=500
+                    )
+                cache.set("chunk_notes", key, notes)
+            report("analyze_chunk", chunk=index + 1)
+        return english, notes
+
+    @traced("detect")
+    async def _detect_language(self, text, selected_model):
+        """Detect language locally, asking the model only when the script histogram is unsure"""
+        if not text or len(text.strip()) < 20:
+            return "en"  # Default to English for very short texts
+
+        local_lang, confidence = detect_script_language(text)
+        if confidence >= CONFIDENCE_THRESHOLD:
+            return local_lang
+
+        cache = self.document_processor.cache
+        key = [cache.hash_content(text[:2000]), selected_model]
+        cached = cache.get("detect", key)
+        if cached is not None:
+            return cached
+
+        try:
+            reply = await self._call(selected_model, LANGUAGE_DETECTION_PROMPT, text[:2000], temperature=0.1, max_tokens=10)
+        except Exception as e:
+            print(f"Language detection error: {str(e)}")
+            return 'en'  # Default to English if detection fails
+        lang = normalize_language_code(reply)
+        cache.set("detect", key, lang)
+        return lang
+
+    @traced("translate")
+    async def _translate(self, text, source_lang, target_lang, selected_model, cache_stage=None):
+        """Translate text with the translator's segmentation and memory, sending batches concurrently"""
+        cache = self.translator.cache
+        key = [cache.hash_content(text), source_lang, target_lang, selected_model]
+        if cache_stage:
+            cached = cache.get(cache_stage, key)
+            if cached is not None:
+                return cached
+
+        # Segmentation and translation memory lookups are local but may touch disk
+        job = await asyncio.to_thread(TranslationJob, self.translator, text, source_lang, target_lang, selected_model)
+        pending = job.misses
+        batches = self.translator._make_batches(pending, job.segments)
+
+        attempt = 0
+        while pending and attempt <= self.translator.max_retries:
+            if attempt > 0:
+                # Retry only the failed segments, one per request
+                await asyncio.sleep(attempt)
+                batches = [[i] for i in pending]
+
+            results = await asyncio.gather(
+                *(self._translate_batch(job, batch) for batch in batches), return_exceptions=True
+            )
+            pending = []
+            for batch, result in zip(batches, results):
+                if isinstance(result, Exception):
+                    print(f"Translation batch error: {str(result)}")
+                    pending.extend(batch)
+                else:
+                    pending.extend(result)
+            attempt += 1
+
+        try:
+            translated, complete = await asyncio.to_thread(job.finish)
+        except Exception as e:
+            print(f"Translation error: {str(e)}")
+            return text  # Return original text if translation fails
+
+        if cache_stage and complete:
+            cache.set(cache_stage, key, translated)
+        return translated
+
+    async def _translate_batch(self, job, batch):
+        """Send one translation batch; returns the indexes that failed"""
+        prompt, content = job.build_request(batch)
+        reply = await self._call(job.selected_model, prompt, content, max_tokens=4000)
+        return job.apply_reply(batch, reply)
+
+    @traced("analyze")
+    async def _analyze(self, text, chunk_notes, selected_model, source_lang="en", target_lang="en", translate_to=None,
+                       on_partial=None):
+        """Produce the four-section analysis from the whole text or from chunk notes; returns (analysis, output)"""
+        # output is the analysis in translate_to, or None when it still has to be translated
+        cache = self.legal_analyzer.cache
+        key = self.legal_analyzer._cache_key(text, selected_model, source_lang, target_lang)
+        cached = cache.get("analyze", key)
+        if cached is not None:
+            return cached, None if translate_to else cached
+
+        notes = None
+        if chunk_notes:
+            notes = join_chunk_notes(chunk_notes)
+            # Very long documents produce notes too long for one call; condense them again
+            while estimate_tokens(notes) > REDUCE_TOKEN_BUDGET:
+                chunks = split_into_chunks(notes, self.legal_analyzer.chunk_tokens)
+                condensed = join_chunk_notes(await asyncio.gather(*(
+                    self._call(selected_model, CHUNK_NOTES_PROMPT.format(part=i + 1), chunk, temperature=0.2, max_tokens=500)
+                    for i, chunk in enumerate(chunks)
+                )))
+                if estimate_tokens(condensed) >= estimate_tokens(notes):
+                    break  # Stop if another pass no longer shrinks the notes
+                notes = condensed
+
+        if on_partial is not None:
+            # The analyzer streams the final call and caches the finished analysis
+            return await self._stream_analysis(
+                text, notes, selected_model, source_lang, target_lang, translate_to, on_partial
+            )
+
+        # Searching the statute index reads the whole text; keep it off the event loop
+        statutes = await asyncio.to_thread(self.legal_analyzer.statute_prompt, text)
+        if notes is None:
+            prompt, content = ANALYSIS_PROMPT + statutes + direct_prompt_suffix(source_lang, target_lang), text
+        else:
+            # Chunk notes are written in English
+            prompt, content = REDUCE_PROMPT + statutes + direct_prompt_suffix("en", target_lang), notes
+
+        analysis = await self._call(selected_model, prompt, content, **ANALYSIS_OPTIONS)
+        if source_lang != "en" or target_lang != "en":
+            analysis = normalize_analysis(analysis)
+        cache.set("analyze", key, analysis)
+        return analysis, None if translate_to else analysis
+
+    async def _stream_analysis(self, text, notes, selected_model, source_lang, target_lang, translate_to, on_partial):
+        """Stream the analyzer's final analysis call, passing the output so far to on_partial; returns (analysis, output)"""
+        # The stream is read on a worker thread; model calls made from there are sent back to
+        # this loop so they share the provider's concurrency cap and rate limit
+        loop = asyncio.get_running_loop()
+        semaphore, bucket = self._provider_limits(selected_model)
+
+        async def acquire():
+            await semaphore.acquire()
+            await bucket.acquire()
+
+        def translate_paragraph(paragraph, source_lang, target_lang, selected_model):
+            return asyncio.run_coroutine_threadsafe(
+                self._translate(paragraph, source_lang, target_lang, selected_model, cache_stage="translate_target"), loop
+            ).result()
+
+        def write():
+            result = {}
+
+            def analysis_stream():
+                # The provider slot is held while the analysis streams and given back before
+                # waiting on the last paragraph translations, which take slots of their own
+                asyncio.run_coroutine_threadsafe(acquire(), loop).result()
+                try:
+                    result["analysis"] = yield from self.legal_analyzer.stream_legal_document(
+                        text, selected_model, source_lang, target_lang, notes=notes
+                    )
+                finally:
+                    loop.call_soon_threadsafe(semaphore.release)
+
+            pieces = analysis_stream()
+            if translate_to:
+                # Finished paragraphs are translated while the rest of the analysis is written
+                pieces = self.translator.stream_translation(
+                    pieces, "en", translate_to, selected_model, translate=translate_paragraph
+                )
+            output_parts = []
+            for piece in pieces:
+                output_parts.append(piece)
+                on_partial("".join(output_parts))
+            analysis = result["analysis"]
+            return analysis, "".join(output_parts).rstrip() if translate_to else analysis
+
+        return await asyncio.to_thread(write)
+
+    async def _call(self, selected_model, system_prompt, user_content, **options):
+        """Send one model request under the provider's concurrency cap and rate limit"""
+        semaphore, bucket = self._provider_limits(selected_model)
+        async with semaphore:
+            await bucket.acquire()
+            return await self.model_manager.agenerate(selected_model, system_prompt, user_content, **options)
+
+    def _provider_limits(self, selected_model):
+        """Return the (semaphore, token bucket) pair for the selected model's provider"""
+        _, model_type = self.model_manager.get_client(selected_model)
+        for loop in [loop for loop in self._limits if loop.is_closed()]:
+            del self._limits[loop]
+        limits = self._limits.setdefault(asyncio.get_running_loop(), {})
+        if model_type not in limits:
+            limits[model_type] = (
+                asyncio.Semaphore(self.max_concurrency),
+                TokenBucket(self.requests_per_minute.get(model_type, 60.0))
+            )
+        return limits[model_type]
+
+
+async def _single_page(text):
+    """Async iterator over a document that arrives as one piece"""
+    yield text
@@ -0,0 +1,114 @@
+import time
+import random
+import threading
+from collections import deque
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+# Exception class names the provider SDKs use for the same conditions
+RETRYABLE_NAMES = ("Timeout", "Connection", "RateLimit", "InternalServer", "ServiceUnavailable",
+                   "DeadlineExceeded", "ResourceExhausted")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+def is_retryable(error):
+    """Return True if an error is transient, e.g. a timeout, rate limit or server error"""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUSES:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__
+    return any(part in name for part in RETRYABLE_NAMES)
+
+
+def retry_delay(attempt, base=0.5, cap=8.0):
+    """Return a 'full jitter' backoff delay for a retry, so clients retrying together spread out"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures, then let one trial call through after a pause"""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Return True if a call may go ahead now"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                # One trial call decides whether the provider has recovered
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """Close the circuit after a call that got an answer"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """Forget a call that was abandoned before it finished, e.g. the loser of a hedged pair"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit at the threshold or when a trial call fails"""
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    print(f"Circuit breaker opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies, for percentile-based hedging"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Add the latency of a successful call"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent, min_samples=1):
+        """Return the given percentile in seconds, or None with fewer than min_samples samples"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, min_samples):
+            return None
+        index = min(len(samples) - 1, int(round(percent / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
@@ -0,0 +1,213 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from telemetry import count
+
+# Bump this when prompts or stage outputs change so stale entries are ignored
+CACHE_VERSION = "2"
+
+# Full rescans of the cache directory happen at least every this many writes, or once
+# writes add up to this share of the size limit, so entries written by other processes
+# (such as batch workers) count towards the limit
+RESCAN_WRITES = 200
+RESCAN_BYTES_RATIO = 0.1
+
+_MISSING = object()
+
+_usage_by_dir = {}
+_usage_lock = threading.Lock()
+
+
+def _shared_usage(cache_dir):
+    """Return the usage counter shared by every ResultCache on cache_dir in this process"""
+    key = os.path.abspath(cache_dir)
+    with _usage_lock:
+        if key not in _usage_by_dir:
+            _usage_by_dir[key] = _DirectoryUsage()
+        return _usage_by_dir[key]
+
+
+class _DirectoryUsage:
+    """Bytes used by one cache directory, and the writes made since it was last scanned"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        self.writes = 0
+        self.bytes_written = 0
+
+
+class ResultCache:
+    """Content-addressed, size-bounded LRU cache for pipeline stage results on local disk"""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        # Cache location and size limit can be overridden from the environment
+        self.cache_dir = cache_dir or os.getenv("RESULT_CACHE_DIR", os.path.join(".cache", "results"))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("RESULT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.enabled = os.getenv("RESULT_CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+        # The document processor, translator and analyzer each have a cache on the same
+        # directory; they share one running total so together they respect the limit
+        self._usage = _shared_usage(self.cache_dir)
+
+        if self.enabled:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+            except OSError as e:
+                print(f"Result cache disabled, cannot create {self.cache_dir}: {str(e)}")
+                self.enabled = False
+
+    @staticmethod
+    def hash_content(content):
+        """Return a hex digest identifying the given bytes or string"""
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return hashlib.sha256(content).hexdigest()
+
+    @staticmethod
+    def hash_file(file_path):
+        """Return a hex digest of a file's contents, read in blocks"""
+        with open(file_path, "rb") as f:
+            return ResultCache.hash_stream(f)
+
+    @staticmethod
+    def hash_stream(file):
+        """Return a hex digest of an open binary file from its start, leaving it rewound"""
+        digest = hashlib.sha256()
+        file.seek(0)
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+        file.seek(0)
+        return digest.hexdigest()
+
+    def _entry_path(self, stage, key_parts):
+        """Map a stage and its key parts to a file inside the cache directory"""
+        raw_key = "\x1f".join([CACHE_VERSION, stage] + [str(part) for part in key_parts])
+        key = hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, stage, key + ".json")
+
+    def get(self, stage, key_parts, default=None):
+        """Return a cached value, or default if the entry is missing"""
+        if not self.enabled:
+            return default
+
+        path = self._entry_path(stage, key_parts)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path, None)
+            count("cache_requests_total", stage=stage, result="hit")
+            return value
+        except FileNotFoundError:
+            count("cache_requests_total", stage=stage, result="miss")
+            return default
+        except (OSError, ValueError) as e:
+            print(f"Result cache read error ({stage}): {str(e)}")
+            return default
+
+    def set(self, stage, key_parts, value):
+        """Store a JSON-serialisable value for a stage"""
+        if not self.enabled:
+            return
+
+        path = self._entry_path(stage, key_parts)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+            # Overwriting an entry replaces its bytes rather than adding to them
+            try:
+                old_size = os.path.getsize(path)
+            except OSError:
+                old_size = 0
+
+            # Write to a temp file first so readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+            usage = self._usage
+            with usage.lock:
+                if usage.total_bytes is not None:
+                    usage.total_bytes += len(data) - old_size
+                usage.writes += 1
+                usage.bytes_written += len(data)
+            self._evict_if_needed()
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Result cache write error ({stage}): {str(e)}")
+
+    def get_or_compute(self, stage, key_parts, compute):
+        """Return the cached value for a stage, computing and storing it on a miss"""
+        value = self.get(stage, key_parts, _MISSING)
+        if value is not _MISSING:
+            print(f"Result cache hit: {stage}")
+            return value
+
+        value = compute()
+        if value is not None:
+            self.set(stage, key_parts, value)
+        return value
+
+    def _scan(self):
+        """Return (mtime, size, path) for every entry in the cache"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        """Remove least recently used entries until the cache fits its size limit"""
+        usage = self._usage
+        with usage.lock:
+            due_for_rescan = (
+                usage.writes >= RESCAN_WRITES or usage.bytes_written >= self.max_bytes * RESCAN_BYTES_RATIO
+            )
+            if usage.total_bytes is not None and usage.total_bytes <= self.max_bytes and not due_for_rescan:
+                return
+
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                # Evict down to 90% of the limit so we don't rescan on every write
+                target = int(self.max_bytes * 0.9)
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except OSError:
+                        pass
+            usage.total_bytes = total
+            usage.writes = usage.bytes_written = 0
+
+    def clear(self):
+        """Remove every cached entry"""
+        usage = self._usage
+        with usage.lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            usage.total_bytes = 0
+            usage.writes = usage.bytes_written = 0
@@ -0,0 +1,94 @@
+"""Measure how long the app's modules take to import on a cold start.
+
+Example:
+    python startup_report.py --budget-ms 500
+
+The modules are imported in a fresh interpreter with ``-X importtime``. The
+report lists each module's cumulative import time and the heaviest packages
+pulled in, and flags any provider SDK or document parser that was imported
+eagerly. The exit status is non-zero when the total is over budget or a
+lazily loaded package was imported, so the check can run in CI or a
+container build.
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+# Modules imported when the app starts, before any document or provider is used
+APP_MODULES = ["model_manager", "document_processor", "translator", "legal_analyzer", "pipeline"]
+
+# Packages that must only be imported when their provider or file type is used
+LAZY_PACKAGES = ["openai", "httpx", "google.generativeai", "PyPDF2", "PIL"]
+
+
+def measure_imports(modules):
+    """Import modules in a fresh interpreter; returns {module: (self_us, cumulative_us)} in import order"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=here, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {', '.join(modules)} failed:\n{result.stderr}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def build_report(timings, modules, budget_ms, top=10):
+    """Return (report lines, True if within budget and nothing lazy was imported eagerly)"""
+    lines = ["Module import times (cumulative):"]
+    total_ms = 0.0
+    for module in modules:
+        cumulative_ms = timings.get(module, (0, 0))[1] / 1000
+        total_ms += cumulative_ms
+        lines.append(f"  {module:<22} {cumulative_ms:8.1f} ms")
+    lines.append(f"  {'total':<22} {total_ms:8.1f} ms (budget {budget_ms:.0f} ms)")
+
+    # Top-level packages only, so a package's submodules are not counted twice
+    packages = sorted(
+        ((name, cumulative) for name, (_, cumulative) in timings.items() if "." not in name and name not in modules),
+        key=lambda item: item[1], reverse=True
+    )
+    lines.append("Heaviest packages:")
+    for name, cumulative in packages[:top]:
+        lines.append(f"  {name:<22} {cumulative / 1000:8.1f} ms")
+
+    eager = [package for package in LAZY_PACKAGES if package in timings]
+    if eager:
+        lines.append(f"Imported at startup but should load lazily: {', '.join(eager)}")
+    else:
+        lines.append("Provider SDKs and document parsers were not imported at startup")
+
+    within_budget = total_ms <= budget_ms
+    if not within_budget:
+        lines.append(f"Over budget by {total_ms - budget_ms:.1f} ms")
+    return lines, within_budget and not eager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the import time of the app's modules on a cold start")
+    parser.add_argument(
+        "--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "500")),
+        help="Maximum total import time in milliseconds (default: STARTUP_BUDGET_MS or 500)"
+    )
+    parser.add_argument("--top", type=int, default=10, help="Number of heaviest packages to list (default: 10)")
+    parser.add_argument("modules", nargs="*", default=APP_MODULES, help="Modules to import (default: the app's modules)")
+    args = parser.parse_args(argv)
+
+    timings = measure_imports(args.modules)
+    lines, ok = build_report(timings, args.modules, args.budget_ms, args.top)
+    print("\n".join(lines))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""BM25 search over sections of Indian statutes, from a prebuilt memory-mapped index.
+
+Example:
+    python statute_index.py build
+    python statute_index.py search "cheque returned unpaid, demand notice sent" -n 5
+    python statute_index.py search --file judgment.txt
+
+The section texts in data/statutes.jsonl (IPC and BNS, CrPC and BNSS, CPC, the
+Contract Act and the Negotiable Instruments Act) are indexed offline with
+``build`` into data/statutes.idx, which ships with the app. At runtime the
+index file is memory-mapped, so opening it reads only the header; searches
+binary-search the term table and read just the postings of the query's terms.
+"""
+import os
+import re
+import sys
+import json
+import math
+import mmap
+import struct
+import hashlib
+import argparse
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_SOURCE_PATH = os.path.join(DATA_DIR, "statutes.jsonl")
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, "statutes.idx")
+
+# BM25 term frequency saturation and document length normalisation
+K1 = 1.2
+B = 0.75
+
+# Query terms citing a section number or CPC order count this many times a word
+CITATION_WEIGHT = 3.0
+
+# Sections scoring under this share of the best match, or under MIN_SCORE, are left out
+RELATIVE_CUTOFF = 0.35
+MIN_SCORE = 4.0
+
+# File layout: header, term offsets, term bytes (sorted), postings table of
+# (first posting, count) per term, postings of (section, term frequency),
+# section lengths, section offsets, section records as JSON. All integers are
+# little-endian uint32; the header holds the position of each part
+MAGIC = b"LAWBM25\x00"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIId16s7Q")
+PAIR = struct.Struct("<II")
+UINT32 = struct.Struct("<I")
+
+STOPWORDS = frozenset("""
+a an and any are as at be been but by can for from had has have he her him his if in into is it its
+may must no not of on or other such that the their them there these they this to under upon was
+were which who whom will with within without would shall so than then also after before being
+""".split())
+
+# "I.P.C.", "Cr.P.C." and "N.I." are written with dots; they are matched as IPC, CrPC and NI
+_DOTTED_ABBREVIATION = re.compile(r"\b(?:[A-Za-z]{1,2}\.\s?){2,}")
+_WORD = re.compile(r"[a-z]+")
+_SECTION_CITATION = re.compile(
+    r"(?:\bsections?|\bsecs?\.?|\bs\.|\bu/s\.?|धारा|ধারা|பிரிவு)\s*"
+    r"(\d{1,3}[a-z]?(?:\s*(?:,|/|&|and|r/w|read with)\s*\d{1,3}[a-z]?)*)",
+    re.IGNORECASE
+)
+_ORDER_CITATION = re.compile(r"\border\s+([ivxl]+)\b", re.IGNORECASE)
+_ACT_REFERENCE = re.compile(r"\b[A-Za-z]+ (\d{1,3}[A-Z]?)")
+
+_shared_index = None
+_shared_index_loaded = False
+_shared_index_lock = threading.Lock()
+
+
+def get_statute_index():
+    """Return the process-wide StatuteIndex, or None if it is turned off or has not been built"""
+    global _shared_index, _shared_index_loaded
+    if not _shared_index_loaded:
+        with _shared_index_lock:
+            if not _shared_index_loaded:
+                _shared_index = _open_default_index()
+                _shared_index_loaded = True
+    return _shared_index
+
+
+def _open_default_index():
+    """Open the index named by STATUTE_INDEX_PATH; returns None if disabled or unusable"""
+    if os.getenv("STATUTE_LOOKUP_DISABLED") == "1":
+        return None
+    path = os.getenv("STATUTE_INDEX_PATH", DEFAULT_INDEX_PATH)
+    try:
+        return StatuteIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"Statute lookup unavailable, analyzing without it: {str(e)}")
+        return None
+
+
+def _stem(word):
+    """Strip common English suffixes so "cheated", "cheating" and "cheats" match"""
+    if len(word) > 5 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Return the stemmed words of text, without stopwords or numbers"""
+    text = _DOTTED_ABBREVIATION.sub(lambda match: re.sub(r"[.\s]", "", match.group(0)) + " ", text)
+    return [_stem(word) for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+def citation_terms(text):
+    """Return index terms for the section numbers and CPC orders cited in text"""
+    # Documents in Indian languages may cite sections in their own digits
+    text = "".join(str(unicodedata.digit(ch)) if ch.isdigit() and not ch.isascii() else ch for ch in text)
+    terms = []
+    for match in _SECTION_CITATION.finditer(text):
+        terms.extend("§" + number.lower() for number in re.findall(r"\d{1,3}[a-z]?", match.group(1), re.IGNORECASE))
+    terms.extend("order:" + numeral.lower() for numeral in _ORDER_CITATION.findall(text))
+    return terms
+
+
+def section_terms(section):
+    """Return the index terms of one statute section"""
+    terms = tokenize(" ".join([section["act"], section["act_name"], section["title"], section["text"]]))
+    number = section["section"]
+    if number.startswith("Order"):
+        terms += citation_terms(number)
+    else:
+        terms.append("§" + re.match(r"\d+[A-Z]?", number).group(0).lower())
+    # A citation of the provision this one replaced or was replaced by should find it too
+    terms += ["§" + cited.lower() for cited in _ACT_REFERENCE.findall(section.get("corresponds", ""))]
+    return terms
+
+
+def query_terms(text):
+    """Return {term: weight} for a document used as a search query"""
+    weights = {term: 1 + math.log(count) for term, count in Counter(tokenize(text)).items()}
+    for term, count in Counter(citation_terms(text)).items():
+        weights[term] = weights.get(term, 0) + CITATION_WEIGHT * (1 + math.log(count))
+    return weights
+
+
+def load_sections(path=DEFAULT_SOURCE_PATH):
+    """Read statute sections from a JSON Lines file"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _uint32s(values):
+    return struct.pack(f"<{len(values)}I", *values)
+
+
+def _pad(data):
+    """Pad to a multiple of 4 bytes so the following uint32 arrays stay aligned"""
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def build_index(sections, output_path=DEFAULT_INDEX_PATH):
+    """Write the BM25 index of sections to output_path; returns (sections, terms, build id)"""
+    postings = defaultdict(list)
+    lengths = []
+    for doc_id, section in enumerate(sections):
+        terms = section_terms(section)
+        lengths.append(len(terms))
+        for term, frequency in Counter(terms).items():
+            postings[term].append((doc_id, frequency))
+
+    vocabulary = sorted(term.encode("utf-8") for term in postings)
+    term_offsets, position = [], 0
+    for term in vocabulary:
+        term_offsets.append(position)
+        position += len(term)
+    term_offsets.append(position)
+
+    table, pairs = [], []
+    for term in vocabulary:
+        entries = postings[term.decode("utf-8")]
+        table += [len(pairs) // 2, len(entries)]
+        for doc_id, frequency in entries:
+            pairs += [doc_id, frequency]
+
+    records = [json.dumps(section, ensure_ascii=False).encode("utf-8") for section in sections]
+    doc_offsets, position = [], 0
+    for record in records:
+        doc_offsets.append(position)
+        position += len(record)
+    doc_offsets.append(position)
+
+    parts = [
+        _uint32s(term_offsets), _pad(b"".join(vocabulary)), _uint32s(table), _uint32s(pairs),
+        _uint32s(lengths), _uint32s(doc_offsets), b"".join(records),
+    ]
+    positions, position = [], HEADER.size
+    for part in parts:
+        positions.append(position)
+        position += len(part)
+
+    body = b"".join(parts)
+    build_id = hashlib.sha256(body).hexdigest()[:16]
+    average_length = sum(lengths) / len(lengths) if lengths else 0.0
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(sections), len(vocabulary), average_length, build_id.encode("ascii"), *positions
+    )
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header + body)
+    # Replace atomically so a running app never maps a half-written index
+    os.replace(temp_path, output_path)
+    return len(sections), len(vocabulary), build_id
+
+
+class StatuteIndex:
+    """Read-only BM25 index over statute sections, memory-mapped from a file built by build_index"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size or self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a statute index")
+        (_, version, self.section_count, self.term_count, self.average_length, build_id,
+         *positions) = HEADER.unpack_from(self._map, 0)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has index format {version}, expected {FORMAT_VERSION}; rebuild it")
+        # Changes whenever the indexed sections change, so cached analyses can be told apart
+        self.build_id = build_id.decode("ascii")
+        (self._term_offsets, self._terms, self._table, self._postings,
+         self._lengths, self._doc_offsets, self._docs) = positions
+
+    def _uint32(self, position):
+        return UINT32.unpack_from(self._map, position)[0]
+
+    def _term(self, index):
+        start, end = PAIR.unpack_from(self._map, self._term_offsets + 4 * index)
+        return self._map[self._terms + start:self._terms + end]
+
+    def _find(self, term):
+        """Return the position of term in the sorted term table, or -1"""
+        low, high = 0, self.term_count - 1
+        while low <= high:
+            middle = (low + high) // 2
+            candidate = self._term(middle)
+            if candidate == term:
+                return middle
+            if candidate < term:
+                low = middle + 1
+            else:
+                high = middle - 1
+        return -1
+
+    def section(self, doc_id):
+        """Return one indexed section as a dict"""
+        start, end = PAIR.unpack_from(self._map, self._doc_offsets + 4 * doc_id)
+        return json.loads(self._map[self._docs + start:self._docs + end].decode("utf-8"))
+
+    def search(self, text, limit=6):
+        """Return up to limit sections best matching text, each with its BM25 score"""
+        scores = defaultdict(float)
+        for term, weight in query_terms(text).items():
+            index = self._find(term.encode("utf-8"))
+            if index < 0:
+                continue
+            first, frequency_count = PAIR.unpack_from(self._map, self._table + 8 * index)
+            idf = math.log(1 + (self.section_count - frequency_count + 0.5) / (frequency_count + 0.5))
+            start = self._postings + 8 * first
+            for doc_id, frequency in PAIR.iter_unpack(self._map[start:start + 8 * frequency_count]):
+                length_ratio = self._uint32(self._lengths + 4 * doc_id) / self.average_length
+                scores[doc_id] += weight * idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length_ratio))
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        if not ranked:
+            return []
+        cutoff = max(MIN_SCORE, ranked[0][1] * RELATIVE_CUTOFF)
+        return [dict(self.section(doc_id), score=round(score, 2)) for doc_id, score in ranked if score >= cutoff]
+
+    def close(self):
+        self._map.close()
+
+
+def section_label(section):
+    """Return how a section is cited, e.g. "IPC section 420" or "CPC Order VII Rule 11" """
+    if section["section"].startswith("Order"):
+        return f"{section['act']} {section['section']}"
+    return f"{section['act']} section {section['section']}"
+
+
+def format_excerpts(sections):
+    """Format found sections as a list for the analysis prompt"""
+    lines = []
+    for section in sections:
+        line = f"- {section_label(section)} ({section['act_name']}), {section['title']}: {section['text']}"
+        if section.get("corresponds"):
+            line += f" Corresponds to {section['corresponds']}."
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or search the statute index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index the statute sections (offline step)")
+    build.add_argument("--source", default=DEFAULT_SOURCE_PATH, help="JSON Lines file of sections (default: data/statutes.jsonl)")
+    build.add_argument("-o", "--output", default=DEFAULT_INDEX_PATH, help="Index file to write (default: data/statutes.idx)")
+
+    search = commands.add_parser("search", help="Show the sections matching a text")
+    search.add_argument("text", nargs="?", help="Text to search for")
+    search.add_argument("--file", help="Read the text from a file instead")
+    search.add_argument("--index", default=DEFAULT_INDEX_PATH, help="Index file (default: data/statutes.idx)")
+    search.add_argument("-n", "--limit", type=int, default=6, help="Sections to show (default: 6)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        section_count, term_count, build_id = build_index(load_sections(args.source), args.output)
+        print(f"Indexed {section_count} sections and {term_count} terms into {args.output} (build {build_id})")
+        return 0
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    elif args.text:
+        text = args.text
+    else:
+        parser.error("give a text or --file")
+    for section in StatuteIndex(args.index).search(text, args.limit):
+        print(f"{section['score']:7.2f}  {section_label(section)}: {section['title']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Generate a synthetic multilingual corpus of legal documents for benchmarks.
+
+Example:
+    python synthetic_corpus.py bench_corpus/ --documents 4 --pages 12 --seed 7
+
+Writes text PDFs, a scanned (image-only) PDF, Word documents and scanned
+images in English, Hindi, Tamil and Bengali. Every page has its own
+sentences, names, dates and amounts, since the boilerplate filter drops
+lines that repeat across pages; only a court header and a "Page N of M"
+footer repeat, as in real filings. The same seed always produces the same
+files, so benchmark runs are comparable.
+"""
+import io
+import os
+import sys
+import json
+import random
+import zipfile
+import argparse
+from xml.sax.saxutils import escape
+
+LANGUAGES = ["en", "hi", "ta", "bn"]
+
+SENTENCES = {
+    "en": [
+        "{name} filed a petition before the court on {date}.",
+        "A notice was issued to the respondent under Section {section}.",
+        "The plaintiff seeks recovery of Rs. {amount} with interest.",
+        "The next hearing in case no. {case} is listed on {date}.",
+        "The court directed both parties to file their documents within {days} days.",
+        "Counsel for {name} sought interim relief pending disposal of the suit.",
+        "The agreement dated {date} required payment of Rs. {amount} in instalments.",
+        "The respondent denied the allegations made under Section {section}.",
+    ],
+    "hi": [
+        "{name} ने दिनांक {date} को न्यायालय में याचिका दायर की।",
+        "प्रतिवादी को धारा {section} के अंतर्गत नोटिस जारी किया गया।",
+        "वादी ने {amount} रुपये की वसूली की मांग की है।",
+        "मामला संख्या {case} की अगली सुनवाई {date} को होगी।",
+        "न्यायालय ने दोनों पक्षों को {days} दिनों में दस्तावेज़ प्रस्तुत करने का निर्देश दिया।",
+        "{name} की ओर से अधिवक्ता ने अंतरिम राहत का अनुरोध किया।",
+        "दिनांक {date} के अनुबंध के अनुसार {amount} रुपये किस्तों में देने थे।",
+        "प्रतिवादी ने धारा {section} के अंतर्गत लगाए गए आरोपों से इनकार किया।",
+    ],
+    "ta": [
+        "{name} அவர்கள் {date} அன்று நீதிமன்றத்தில் மனு தாக்கல் செய்தார்.",
+        "பிரிவு {section} இன் கீழ் எதிர்மனுதாரருக்கு அறிவிப்பு அனுப்பப்பட்டது.",
+        "மனுதாரர் {amount} ரூபாய் திரும்பப் பெற கோருகிறார்.",
+        "வழக்கு எண் {case} இன் அடுத்த விசாரணை {date} அன்று நடைபெறும்.",
+        "இரு தரப்பினரும் {days} நாட்களுக்குள் ஆவணங்களை சமர்ப்பிக்க நீதிமன்றம் உத்தரவிட்டது.",
+        "{name} சார்பில் வழக்கறிஞர் இடைக்கால நிவாரணம் கோரினார்.",
+        "{date} தேதியிட்ட ஒப்பந்தப்படி {amount} ரூபாய் தவணைகளில் செலுத்தப்பட வேண்டும்.",
+        "பிரிவு {section} இன் கீழ் சுமத்தப்பட்ட குற்றச்சாட்டுகளை எதிர்மனுதாரர் மறுத்தார்.",
+    ],
+    "bn": [
+        "{name} {date} তারিখে আদালতে আবেদন দাখিল করেন।",
+        "ধারা {section} অনুযায়ী বিবাদীকে নোটিশ পাঠানো হয়েছে।",
+        "বাদী {amount} টাকা আদায়ের দাবি করেছেন।",
+        "মামলা নম্বর {case} এর পরবর্তী শুনানি {date} তারিখে হবে।",
+        "আদালত উভয় পক্ষকে {days} দিনের মধ্যে নথি জমা দেওয়ার নির্দেশ দিয়েছে।",
+        "{name} এর পক্ষে আইনজীবী অন্তর্বর্তী প্রতিকার চেয়েছেন।",
+        "{date} তারিখের চুক্তি অনুযায়ী {amount} টাকা কিস্তিতে দেওয়ার কথা ছিল।",
+        "বিবাদী ধারা {section} অনুযায়ী আনা অভিযোগ অস্বীকার করেছেন।",
+    ],
+}
+
+NAMES = {
+    "en": ["Ramesh Kumar", "Priya Nair", "Arjun Singh", "Fatima Sheikh", "Suresh Iyer", "Meena Joshi"],
+    "hi": ["राम कुमार", "सीता देवी", "अमित शर्मा", "सुनीता वर्मा", "मोहन लाल", "गीता सिंह"],
+    "ta": ["முருகன்", "லட்சுமி", "கார்த்திக்", "மீனாட்சி", "செல்வம்", "பிரியா"],
+    "bn": ["রহিম", "সুমিতা দাস", "অমল বসু", "রিনা সেন", "সুব্রত ঘোষ", "মৌসুমী রায়"],
+}
+
+HEADERS = {
+    "en": "IN THE COURT OF THE CIVIL JUDGE (SENIOR DIVISION)",
+    "hi": "सिविल न्यायाधीश (वरिष्ठ खंड) के न्यायालय में",
+    "ta": "உரிமையியல் நீதிபதி (மூத்த பிரிவு) நீதிமன்றத்தில்",
+    "bn": "দেওয়ানি বিচারক (সিনিয়র ডিভিশন) এর আদালতে",
+}
+
+FOOTERS = {"en": "Page {page} of {pages}", "hi": "पृष्ठ {page} / {pages}", "ta": "பக்கம் {page} / {pages}",
+           "bn": "পৃষ্ঠা {page} / {pages}"}
+
+
+def page_lines(rng, lang, sentences=14):
+    """Return the body lines of one page, each sentence filled with its own details"""
+    return [
+        rng.choice(SENTENCES[lang]).format(
+            name=rng.choice(NAMES[lang]),
+            date=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2015, 2024)}",
+            section=rng.choice(["138", "420", "406", "498A", "125", "9", "34"]),
+            amount=f"{rng.randint(5, 900) * 1000:,}",
+            case=f"{rng.randint(100, 9999)}/{rng.randint(2015, 2024)}",
+            days=rng.choice([7, 15, 30, 45, 60]),
+        )
+        for _ in range(sentences)
+    ]
+
+
+def document_pages(rng, lang, pages):
+    """Return the lines of every page, with the repeated header and page-number footer real filings have"""
+    return [
+        [HEADERS[lang]] + page_lines(rng, lang) + [FOOTERS[lang].format(page=page, pages=pages)]
+        for page in range(1, pages + 1)
+    ]
+
+
+def _pdf(objects):
+    """Serialise numbered PDF objects (bytes) into a complete file"""
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("ascii")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("ascii")
+    return bytes(out)
+
+
+def _stream(data, extra=""):
+    return f"<< /Length {len(data)}{extra} >>\nstream\n".encode("ascii") + data + b"\nendstream"
+
+
+def text_pdf(pages):
+    """Return a PDF whose text layer holds the given lines per page, in any script"""
+    # Characters are written as their own code points with an Identity-H font, and a
+    # ToUnicode map lets text extraction recover them; no glyphs are embedded, so the
+    # pages are for extraction, not for reading
+    chars = sorted({ch for lines in pages for line in lines for ch in line if ord(ch) < 0x10000})
+    blocks = [chars[i:i + 100] for i in range(0, len(chars), 100)]
+    cmap = (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n"
+        + "".join(
+            f"{len(block)} beginbfchar\n" + "".join(f"<{ord(ch):04X}> <{ord(ch):04X}>\n" for ch in block) + "endbfchar\n"
+            for block in blocks
+        )
+        + "endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend"
+    ) if chars else ""
+
+    count = len(pages)
+    kids = " ".join(f"{7 + 2 * i} 0 R" for i in range(count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {count} >>".encode("ascii"),
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /SyntheticUnicode /Encoding /Identity-H "
+        b"/DescendantFonts [4 0 R] /ToUnicode 5 0 R >>",
+        b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /SyntheticUnicode "
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+        b"/FontDescriptor 6 0 R /CIDToGIDMap /Identity /DW 500 >>",
+        _stream(cmap.encode("ascii")),
+        b"<< /Type /FontDescriptor /FontName /SyntheticUnicode /Flags 4 /FontBBox [0 -200 1000 900] "
+        b"/ItalicAngle 0 /Ascent 900 /Descent -200 /CapHeight 700 /StemV 80 >>",
+    ]
+    for i, lines in enumerate(pages):
+        text = "".join(
+            "<" + "".join(f"{ord(ch):04X}" for ch in line if ord(ch) < 0x10000) + "> Tj T*\n" for line in lines
+        )
+        content = f"BT /F1 10 Tf 14 TL 40 800 Td\n{text}ET".encode("ascii")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {8 + 2 * i} 0 R >>".encode("ascii")
+        )
+        objects.append(_stream(content))
+    return _pdf(objects)
+
+
+def scanned_pdf(images):
+    """Return a PDF with one JPEG per page and no text layer, like a scanner produces"""
+    count = len(images)
+    kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(count))
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {count} >>".encode("ascii")]
+    for i, (data, width, height) in enumerate(images):
+        content, image = 4 + 3 * i, 5 + 3 * i
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /XObject << /Im{i} {image} 0 R >> >> "
+            f"/Contents {content} 0 R >>".encode("ascii")
+        )
+        objects.append(_stream(f"q 595 0 0 842 0 0 cm /Im{i} Do Q".encode("ascii")))
+        objects.append(_stream(
+            data, f" /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                  f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /DCTDecode"
+        ))
+    return _pdf(objects)
+
+
+def scan_image(rng, lines, width=1240, height=1754):
+    """Return (JPEG bytes, width, height) of a noisy page image with the lines drawn on it"""
+    from PIL import Image, ImageDraw
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    # The default bitmap font only covers Latin text; other scripts come out as boxes,
+    # which is fine since the stand-in server does the reading
+    for i, line in enumerate(lines):
+        draw.text((60, 60 + i * 36), line, fill=0)
+    # Speckle so the image does not compress to nothing, like a real scan
+    for _ in range(4000):
+        draw.point((rng.randrange(width), rng.randrange(height)), fill=rng.randint(0, 200))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=80)
+    return buffer.getvalue(), width, height
+
+
+def docx(pages):
+    """Return a Word document with the body lines as paragraphs, the header as a header part and a table"""
+    def paragraph(text):
+        return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    namespace = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    body = "".join(paragraph(line) for lines in pages for line in lines[1:-1])
+    rows = "".join(
+        f"<w:tr><w:tc>{paragraph(str(i + 1))}</w:tc><w:tc>{paragraph(lines[1])}</w:tc></w:tr>"
+        for i, lines in enumerate(pages[:5])
+    )
+    document = f'<?xml version="1.0" encoding="UTF-8"?><w:document {namespace}><w:body>{body}<w:tbl>{rows}</w:tbl></w:body></w:document>'
+    header = f'<?xml version="1.0" encoding="UTF-8"?><w:hdr {namespace}>{paragraph(pages[0][0])}</w:hdr>'
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '<Override PartName="/word/header1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>'
+            '</Types>'
+        ))
+        archive.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ))
+        archive.writestr("word/_rels/document.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/header" '
+            'Target="header1.xml"/></Relationships>'
+        ))
+        archive.writestr("word/document.xml", document)
+        archive.writestr("word/header1.xml", header)
+    return buffer.getvalue()
+
+
+def build_corpus(output_dir, documents=2, pages=8, seed=7, languages=None):
+    """Write the corpus into output_dir; returns a manifest of {path, format, language, pages}"""
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = []
+
+    def write(name, data, file_format, lang, page_count):
+        path = os.path.join(output_dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        manifest.append({"path": path, "format": file_format, "language": lang, "pages": page_count})
+
+    for lang in languages or LANGUAGES:
+        for i in range(documents):
+            write(f"{lang}_notice_{i + 1}.pdf", text_pdf(document_pages(rng, lang, pages)), "pdf", lang, pages)
+            write(f"{lang}_petition_{i + 1}.docx", docx(document_pages(rng, lang, pages)), "docx", lang, pages)
+        scan = scan_image(rng, document_pages(rng, lang, 1)[0])
+        write(f"{lang}_scan.jpg", scan[0], "image", lang, 1)
+
+    # Scanned PDF pages are read with the vision model, one request per page
+    scans = [scan_image(rng, lines) for lines in document_pages(rng, "en", min(pages, 4))]
+    write("en_scanned_order.pdf", scanned_pdf(scans), "scanned_pdf", "en", len(scans))
+
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic multilingual legal documents for benchmarks")
+    parser.add_argument("output_dir", help="Directory to write the documents to")
+    parser.add_argument("--documents", type=int, default=2, help="PDF and Word documents per language (default: 2)")
+    parser.add_argument("--pages", type=int, default=8, help="Pages per document (default: 8)")
+    parser.add_argument("--languages", default=",".join(LANGUAGES), help="Comma-separated language codes (default: all)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: 7)")
+    args = parser.parse_args(argv)
+
+    languages = [code.strip() for code in args.languages.split(",") if code.strip()]
+    manifest = build_corpus(args.output_dir, args.documents, args.pages, args.seed, languages)
+    print(f"Wrote {len(manifest)} documents to {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
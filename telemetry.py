@@ -0,0 +1,302 @@
+import os
+import time
+import inspect
+import functools
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+
+METRIC_PREFIX = "legal_ai_"
+
+# Every metric with its Prometheus type and help text
+METRICS = {
+    "stage_seconds": ("histogram", "Time spent in each processing stage"),
+    "model_call_seconds": ("histogram", "Time of each model call attempt by provider, stage and outcome"),
+    "model_tokens_total": ("counter", "Tokens used by model calls by provider, stage and kind"),
+    "model_request_bytes_total": ("counter", "Bytes of prompts, text and images sent to model providers"),
+    "model_retries_total": ("counter", "Model call attempts retried after a transient error"),
+    "model_failovers_total": ("counter", "Model calls failed over to the other provider"),
+    "model_hedges_total": ("counter", "Slow model calls also sent to the other provider"),
+    "document_bytes_total": ("counter", "Bytes of documents read for extraction"),
+    "pages_total": ("counter", "PDF pages read from the text layer or with the vision model"),
+    "cache_requests_total": ("counter", "Result cache lookups by stage and result"),
+    "translation_memory_segments_total": ("counter", "Segments looked up in the translation memory by result"),
+    "jobs_total": ("counter", "Background analysis jobs finished by status"),
+}
+
+# Histogram bucket bounds in seconds, from a cached page to a long model call
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# The trace of the document being processed and the stage currently running, if any.
+# Both follow asyncio tasks; worker threads need bind_context
+_current_trace = contextvars.ContextVar("trace", default=None)
+_current_stage = contextvars.ContextVar("stage", default=None)
+
+_shared_metrics = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide MetricsRegistry, creating it on first use"""
+    global _shared_metrics
+    if _shared_metrics is None:
+        with _shared_metrics_lock:
+            if _shared_metrics is None:
+                _shared_metrics = MetricsRegistry()
+    return _shared_metrics
+
+
+def _label_text(labels):
+    """Format label pairs as a Prometheus label set"""
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide counters and latency histograms, rendered in the Prometheus text format"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # (name, sorted label pairs) -> value, or [bucket counts..., sum, count] for histograms
+        self._counters = defaultdict(float)
+        self._histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def observe(self, name, value, **labels):
+        """Record one value, e.g. a duration in seconds, in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def value(self, name, **labels):
+        """Return a counter's value, or a histogram's observation count"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._histograms:
+                return self._histograms[key][-1]
+            return self._counters.get(key, 0)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            full_name = METRIC_PREFIX + name
+            series = sorted(item for item in (histograms if kind == "histogram" else counters).items() if item[0][0] == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for (_, labels), value in series:
+                if kind == "counter":
+                    lines.append(f"{full_name}{_label_text(labels)} {value:g}")
+                    continue
+                for bound, count in zip(self.buckets, value):
+                    lines.append(f"{full_name}_bucket{_label_text(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{full_name}_bucket{_label_text(labels + (('le', '+Inf'),))} {value[-1]}")
+                lines.append(f"{full_name}_sum{_label_text(labels)} {value[-2]:.6f}")
+                lines.append(f"{full_name}_count{_label_text(labels)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Timing spans and counts recorded while processing one document"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._spans = []
+        self._counts = defaultdict(float)
+
+    def add_span(self, name, started, seconds, **attributes):
+        """Record a finished span; started is a time.perf_counter() reading"""
+        span = {"name": name, "start": round(started - self.started, 4), "seconds": round(seconds, 4)}
+        span.update(attributes)
+        with self._lock:
+            self._spans.append(span)
+
+    def add(self, name, amount=1):
+        """Add to one of the trace's counts"""
+        with self._lock:
+            self._counts[name] += amount
+
+    def to_dict(self, max_spans=None):
+        """Return the trace as JSON-serialisable data, with time per stage summed over all spans"""
+        with self._lock:
+            spans = list(self._spans)
+            counts = dict(self._counts)
+        stages = {}
+        for span in spans:
+            stage = stages.setdefault(span["name"], {"spans": 0, "seconds": 0.0})
+            stage["spans"] += 1
+            stage["seconds"] = round(stage["seconds"] + span["seconds"], 4)
+        # A long PDF has a span per page; only the slowest are listed individually
+        dropped = 0
+        if max_spans is not None and len(spans) > max_spans:
+            dropped = len(spans) - max_spans
+            spans = sorted(spans, key=lambda span: span["seconds"], reverse=True)[:max_spans]
+        return {
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "stages": stages,
+            "counts": counts,
+            "spans": sorted(spans, key=lambda span: span["start"]),
+            "dropped_spans": dropped,
+        }
+
+
+@contextmanager
+def tracing(trace=None):
+    """Record spans and counts made inside the block, including on bound worker threads, into a Trace"""
+    trace = trace or Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def bind_context(function):
+    """Return function bound to the caller's trace and stage, for running on a worker thread"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time, so each call gets its own copy
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+
+def current_stage():
+    """Return the name of the innermost stage span running, or None"""
+    return _current_stage.get()
+
+
+@contextmanager
+def span(stage, **attributes):
+    """Time a processing stage into the stage histogram and the current trace"""
+    token = _current_stage.set(stage)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        seconds = time.perf_counter() - started
+        _current_stage.reset(token)
+        get_metrics().observe("stage_seconds", seconds, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(stage, started, seconds, **attributes)
+
+
+def traced(stage):
+    """Decorator timing every call of a function or coroutine function as a stage span"""
+    def decorate(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def run_async(*args, **kwargs):
+                with span(stage):
+                    return await function(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            with span(stage):
+                return function(*args, **kwargs)
+        return run
+    return decorate
+
+
+def count(name, amount=1, **labels):
+    """Add to a counter and to the current trace's count of the same name"""
+    get_metrics().inc(name, amount, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        label_text = ",".join(f"{label}={value}" for label, value in sorted(labels.items()))
+        trace.add(f"{name}{{{label_text}}}" if label_text else name, amount)
+
+
+def record_model_call(provider, seconds, outcome="ok"):
+    """Record one model call attempt under the stage that made it"""
+    stage = current_stage() or "other"
+    get_metrics().observe("model_call_seconds", seconds, provider=provider, stage=stage, outcome=outcome)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span("model_call", time.perf_counter() - seconds, seconds,
+                       provider=provider, stage=stage, outcome=outcome)
+
+
+def response_tokens(response):
+    """Return (prompt tokens, completion tokens) reported by an OpenAI or Gemini response"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None:
+        return getattr(metadata, "prompt_token_count", 0) or 0, getattr(metadata, "candidates_token_count", 0) or 0
+    return 0, 0
+
+
+def record_usage(provider, request_bytes=0, response=None):
+    """Count the bytes sent in a model request and the tokens its response reports"""
+    stage = current_stage() or "other"
+    if request_bytes:
+        count("model_request_bytes_total", request_bytes, provider=provider)
+    prompt_tokens, completion_tokens = response_tokens(response) if response is not None else (0, 0)
+    if prompt_tokens:
+        count("model_tokens_total", prompt_tokens, provider=provider, stage=stage, kind="prompt")
+    if completion_tokens:
+        count("model_tokens_total", completion_tokens, provider=provider, stage=stage, kind="completion")
+
+
+def start_metrics_server(port=None, host=None):
+    """Serve /metrics on a background thread; returns the server, or None if disabled or the port is taken"""
+    port = int(os.getenv("METRICS_PORT", "9464")) if port is None else port
+    host = host or os.getenv("METRICS_HOST", "127.0.0.1")
+    if not port:
+        return None
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = get_metrics().render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the console
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {str(e)}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Serving metrics at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,152 @@
+import re
+from collections import Counter
+from utils import estimate_tokens
+
+# Headers and footers live in the first and last few lines of a page
+EDGE_LINES = 3
+# Pages read before deciding which lines are boilerplate; later pages are filtered as they arrive
+WARMUP_PAGES = 10
+# An edge line on this share of pages (and at least MIN_REPEAT_PAGES) is a header or footer
+REPEAT_RATIO = 0.5
+MIN_REPEAT_PAGES = 3
+# A short line anywhere on this share of pages is a watermark or stamp
+WATERMARK_RATIO = 0.8
+WATERMARK_MAX_CHARS = 80
+WATERMARK_MIN_LETTERS = 3
+MIN_WATERMARK_PAGES = 5
+
+# Page numbers in explicit forms only: "Page 3", "Page 3 of 10", "- 3 -", "3/10", "3 of 10"
+# or a plain "3". Bracketed numbers such as "(16)" are paragraph markers and are kept
+PAGE_NUMBER_LINE = re.compile(
+    r'^\s*(page\s*\d{1,4}(\s*(of|/)\s*\d{1,4})?|[-–—]\s*\d{1,4}\s*[-–—]|\d{1,4}(\s*(of|/)\s*\d{1,4})?)\s*$',
+    re.IGNORECASE
+)
+# Numbered paragraphs such as "15." or "(16)" share one signature but are content
+PARAGRAPH_NUMBER_SIGNATURE = re.compile(r'^[(\[]?#[.)\]]?$')
+HYPHEN_BREAK = re.compile(r'(?<=[a-z])-\n(?=[a-z])')
+
+
+def line_signature(line):
+    """Normalise a line so a header repeated with a different page number or date still matches"""
+    return re.sub(r'\d+', '#', re.sub(r'\s+', ' ', line).strip().lower())
+
+
+def watermark_signature(line):
+    """Normalise a line for the watermark rule, keeping digits; returns "" for lines with too few letters"""
+    # Numbers such as paragraph numbers "15." differ on every page and are content, not stamps
+    signature = re.sub(r'\s+', ' ', line).strip().lower()
+    if sum(ch.isalpha() for ch in signature) < WATERMARK_MIN_LETTERS:
+        return ""
+    return signature
+
+
+def normalize_whitespace(text):
+    """Join words hyphenated across lines and collapse runs of spaces and blank lines"""
+    text = text.replace('\u00ad', '')
+    text = HYPHEN_BREAK.sub('', text)
+    text = re.sub(r'[ \t\u00a0]+', ' ', text)
+    text = re.sub(r' ?\n ?', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+class BoilerplateFilter:
+    """Streaming filter that drops repeated headers, footers and page numbers from pages of text"""
+
+    def __init__(self, repeated_lines=True, warmup_pages=WARMUP_PAGES):
+        # Repeated-line detection only makes sense for real pages, not arbitrary sections
+        self.repeated_lines = repeated_lines
+        self.warmup_pages = warmup_pages
+        self._pending = []
+        self._edge_signatures = None
+        self._watermark_signatures = None
+        self.stats = {"chars_before": 0, "chars_after": 0, "lines_removed": 0, "tokens_before": 0, "tokens_after": 0}
+        # Where each cleaned page starts in the text the pages are joined into, one per line
+        self.page_starts = []
+        self._next_start = 0
+
+    def feed(self, page_text):
+        """Add the next page; returns the cleaned pages that are ready, in order"""
+        self.stats["chars_before"] += len(page_text)
+        self.stats["tokens_before"] += estimate_tokens(page_text)
+        if self._edge_signatures is None and self.repeated_lines:
+            self._pending.append(page_text)
+            if len(self._pending) < self.warmup_pages:
+                return []
+            self._learn(self._pending)
+            pages, self._pending = self._pending, []
+            return [self._clean(page) for page in pages]
+        return [self._clean(page_text)]
+
+    def finish(self):
+        """Return any pages still held for warmup, cleaned, and print what was saved"""
+        pages = []
+        if self._pending:
+            self._learn(self._pending)
+            pages = [self._clean(page) for page in self._pending]
+            self._pending = []
+        stats = self.summary()
+        print(
+            f"Cleanup removed {stats['lines_removed']} boilerplate lines, "
+            f"saving {stats['chars_saved']} characters (~{stats['tokens_saved']} tokens)"
+        )
+        return pages
+
+    def summary(self):
+        """Return the characters, estimated tokens and lines saved so far"""
+        stats = dict(self.stats)
+        stats["chars_saved"] = stats["chars_before"] - stats["chars_after"]
+        stats["tokens_saved"] = max(0, stats["tokens_before"] - stats["tokens_after"])
+        return stats
+
+    def _learn(self, pages):
+        """Find the edge lines and short lines repeated across the warmup pages"""
+        self._edge_signatures = set()
+        self._watermark_signatures = set()
+        if len(pages) < MIN_REPEAT_PAGES:
+            return
+
+        edge_counts = Counter()
+        line_counts = Counter()
+        for page in pages:
+            lines = [line for line in page.split("\n") if line.strip()]
+            # Count each line once per page, however often it appears on it
+            edge_counts.update({line_signature(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+            line_counts.update({watermark_signature(line) for line in lines if len(line.strip()) <= WATERMARK_MAX_CHARS})
+
+        edge_threshold = max(MIN_REPEAT_PAGES, len(pages) * REPEAT_RATIO)
+        self._edge_signatures = {
+            sig for sig, count in edge_counts.items()
+            if count >= edge_threshold and not PARAGRAPH_NUMBER_SIGNATURE.match(sig)
+        }
+        if len(pages) >= MIN_WATERMARK_PAGES:
+            watermark_threshold = len(pages) * WATERMARK_RATIO
+            self._watermark_signatures = {
+                sig for sig, count in line_counts.items() if sig and count >= watermark_threshold
+            }
+
+    def _clean(self, page_text):
+        """Drop boilerplate lines from one page and normalise its whitespace"""
+        lines = page_text.split("\n")
+        if self.repeated_lines:
+            # Positions of the first and last few non-blank lines
+            content = [i for i, line in enumerate(lines) if line.strip()]
+            edges = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+            kept = []
+            for i, line in enumerate(lines):
+                signature = line_signature(line)
+                if signature and (
+                    watermark_signature(line) in self._watermark_signatures
+                    or (i in edges and (signature in self._edge_signatures or PAGE_NUMBER_LINE.match(line)))
+                ):
+                    self.stats["lines_removed"] += 1
+                    continue
+                kept.append(line)
+            lines = kept
+
+        cleaned = normalize_whitespace("\n".join(lines))
+        self.page_starts.append(self._next_start)
+        self._next_start += len(cleaned) + 1
+        self.stats["chars_after"] += len(cleaned)
+        self.stats["tokens_after"] += estimate_tokens(cleaned)
+        return cleaned
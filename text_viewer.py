@@ -0,0 +1,104 @@
+import os
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Matches listed for one search; the count beyond this is still reported
+SEARCH_MAX_MATCHES = 200
+# Characters shown either side of a match in the list of matches
+SNIPPET_CHARS = 40
+
+
+class PagedText:
+    """Extracted text split into pages of a bounded size, with offset indexes for page jumps and search"""
+
+    def __init__(self, text, page_starts=None, page_chars=None):
+        self.text = text
+        # Long pages, and documents without page boundaries, are shown in windows of at most page_chars
+        self.page_chars = page_chars or int(os.getenv("VIEWER_PAGE_CHARS", "6000"))
+
+        page_starts = [start for start in (page_starts or [0]) if start < len(text)] or [0]
+        self.page_count = len(page_starts)
+        # Offset where each window starts, and the page it belongs to; windows of one page are contiguous
+        self._window_starts = array("q")
+        self._window_pages = array("l")
+        for page, start in enumerate(page_starts, start=1):
+            end = page_starts[page] if page < len(page_starts) else len(text)
+            for window_start in self._split(start, end):
+                self._window_starts.append(window_start)
+                self._window_pages.append(page)
+        # Offset of every line start, to report the line a match is on
+        self._line_starts = array("q", [0])
+        self._line_starts.extend(match.end() for match in re.finditer("\n", text))
+        self._last_search = (None, [], 0)
+
+    def _split(self, start, end):
+        """Yield the start offsets of windows covering text[start:end], breaking at line ends where possible"""
+        while end - start > self.page_chars:
+            cut = self.text.rfind("\n", start, start + self.page_chars)
+            cut = cut + 1 if cut > start else start + self.page_chars
+            yield start
+            start = cut
+        yield start
+
+    @property
+    def window_count(self):
+        return len(self._window_starts)
+
+    def window_range(self, window):
+        """Return the (start, end) offsets of a window"""
+        start = self._window_starts[window]
+        end = self._window_starts[window + 1] if window + 1 < self.window_count else len(self.text)
+        return start, end
+
+    def window_text(self, window):
+        """Return the text of one window; only this is sent to the page"""
+        start, end = self.window_range(window)
+        return self.text[start:end]
+
+    def page_of(self, window):
+        """Return the page number a window belongs to"""
+        return self._window_pages[window]
+
+    def first_window(self, page):
+        """Return the first window of a page number"""
+        page = max(1, min(page, self.page_count))
+        return bisect_left(self._window_pages, page)
+
+    def window_part(self, window):
+        """Return (part, parts) of a window within its page"""
+        page = self._window_pages[window]
+        first = bisect_left(self._window_pages, page)
+        return window - first + 1, bisect_right(self._window_pages, page) - first
+
+    def window_at(self, offset):
+        """Return the window containing a character offset"""
+        return max(0, bisect_right(self._window_starts, offset) - 1)
+
+    def line_at(self, offset):
+        """Return the 1-based line number of a character offset"""
+        return bisect_right(self._line_starts, offset)
+
+    def search(self, query, max_matches=SEARCH_MAX_MATCHES):
+        """Return (matches, total) for a case-insensitive search; each match has its offset, window, page, line and snippet"""
+        query = query.strip()
+        if not query:
+            return [], 0
+        if self._last_search[0] == query:
+            return self._last_search[1], self._last_search[2]
+
+        matches, total = [], 0
+        for match in re.finditer(re.escape(query), self.text, re.IGNORECASE):
+            total += 1
+            if len(matches) >= max_matches:
+                continue
+            start, end = match.span()
+            window = self.window_at(start)
+            snippet = self.text[max(0, start - SNIPPET_CHARS):end + SNIPPET_CHARS].replace("\n", " ")
+            matches.append({
+                "offset": start, "window": window, "page": self.page_of(window),
+                "line": self.line_at(start), "snippet": snippet,
+            })
+        # Paging reruns the viewer with the same query; keep the last result
+        self._last_search = (query, matches, total)
+        return matches, total
@@ -0,0 +1,108 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from telemetry import count
+
+
+class TranslationMemory:
+    """Persistent segment-level translation memory backed by SQLite"""
+
+    def __init__(self, db_path=None, max_entries=None):
+        # Location and size limit can be overridden from the environment
+        self.db_path = db_path or os.getenv(
+            "TRANSLATION_MEMORY_PATH", os.path.join(".cache", "translation_memory.sqlite3")
+        )
+        self.max_entries = max_entries or int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "200000"))
+        self.enabled = os.getenv("TRANSLATION_MEMORY_DISABLED", "").lower() not in ("1", "true", "yes")
+
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if self.enabled:
+            try:
+                directory = os.path.dirname(self.db_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # One connection shared by the translator's worker threads, guarded by the lock
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+                # WAL lets the app and batch runs read while another process writes
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS segments ("
+                    "key TEXT PRIMARY KEY, translation TEXT NOT NULL, last_used REAL NOT NULL)"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS segments_last_used ON segments (last_used)")
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Translation memory disabled, cannot open {self.db_path}: {str(e)}")
+                self.enabled = False
+
+    @staticmethod
+    def normalize(segment):
+        """Normalise a segment so trivially different copies share one entry"""
+        segment = unicodedata.normalize("NFC", segment)
+        return re.sub(r'\s+', ' ', segment).strip()
+
+    def make_key(self, segment, source_lang, target_lang, model):
+        """Return the memory key for a segment, language pair and model"""
+        raw_key = "\x1f".join([source_lang, target_lang, model, self.normalize(segment)])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def lookup(self, keys):
+        """Return a dict of key -> translation for the keys found in memory"""
+        if not self.enabled or not keys:
+            return {}
+
+        found = {}
+        try:
+            with self._lock:
+                unique_keys = list(set(keys))
+                # Stay well under SQLite's limit on bound parameters
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self._conn.execute(
+                        f"SELECT key, translation FROM segments WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    found.update(rows)
+                count("translation_memory_segments_total", len(found), result="hit")
+                count("translation_memory_segments_total", len(unique_keys) - len(found), result="miss")
+
+                # Mark hits as recently used so eviction keeps them
+                if found:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE segments SET last_used = ? WHERE key = ?", [(now, key) for key in found]
+                    )
+                    self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Translation memory read error: {str(e)}")
+        return found
+
+    def store(self, entries):
+        """Store a dict of key -> translation, evicting least recently used entries over the limit"""
+        if not self.enabled or not entries:
+            return
+
+        try:
+            with self._lock:
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO segments (key, translation, last_used) VALUES (?, ?, ?)",
+                    [(key, translation, now) for key, translation in entries.items()]
+                )
+                total = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+                if total > self.max_entries:
+                    # Evict down to 90% of the limit so we don't evict on every write
+                    excess = total - int(self.max_entries * 0.9)
+                    self._conn.execute(
+                        "DELETE FROM segments WHERE key IN "
+                        "(SELECT key FROM segments ORDER BY last_used LIMIT ?)", (excess,)
+                    )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Translation memory write error: {str(e)}")
@@ -1,108 +1,269 @@
-import google.generativeai as genai
-from model_manager import ModelManager
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from model_manager import get_model_manager
+from result_cache import ResultCache
+from translation_memory import TranslationMemory
+from utils import estimate_tokens, split_into_segments
+from telemetry import span, bind_context
+
+# Map language codes to full names for better prompting
+LANGUAGE_NAMES = {
+    'hi': 'Hindi',
+    'ta': 'Tamil',
+    'te': 'Telugu',
+    'bn': 'Bengali',
+    'mr': 'Marathi',
+    'gu': 'Gujarati',
+    'kn': 'Kannada',
+    'ml': 'Malayalam',
+    'pa': 'Punjabi',
+    'or': 'Odia',
+    'en': 'English'
+}
+
+TRANSLATION_PROMPT = "You are a professional translator from {source} to {target}. Translate the following text accurately, preserving all information."
+
+BATCH_TRANSLATION_PROMPT = TRANSLATION_PROMPT + " The text is split into numbered segments, each starting with a marker line such as [[1]]. Translate every segment separately and keep each marker line exactly as it is, on its own line before that segment's translation. Do not merge, split, skip or reorder segments."
+
+_SEGMENT_MARKER = re.compile(r'^\s*\[\[(\d+)\]\]\s*$', re.MULTILINE)
 
 class Translator:
-    def __init__(self):
-        # Initialize model manager
-        self.model_manager = ModelManager()
-    
+    def __init__(self, batch_tokens=None, max_workers=None, max_retries=None, model_manager=None):
+        # Share the process-wide model manager and its pooled clients
+        self.model_manager = model_manager or get_model_manager()
+        # Translations are cached by text content, language pair and model
+        self.cache = ResultCache()
+        # Individual segments are remembered across documents, so boilerplate is translated once
+        self.memory = TranslationMemory()
+
+        # Texts are split into sentence segments and sent in batches of up to batch_tokens,
+        # with at most max_workers batches in flight at once
+        self.batch_tokens = batch_tokens or int(os.getenv("TRANSLATION_BATCH_TOKENS", "500"))
+        self.max_workers = max_workers or int(os.getenv("TRANSLATION_MAX_WORKERS", "4"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("TRANSLATION_MAX_RETRIES", "2"))
+
     def translate_to_english(self, text, source_lang, selected_model="OpenAI (GPT-3.5)"):
         """Translate text from source language to English using selected AI model"""
         # If already English, return as is
         if source_lang == "en":
             return text
-            
-        client, model_type = self.model_manager.get_client(selected_model)
-        
-        # Map language codes to full names for better prompting
-        lang_names = {
-            'hi': 'Hindi',
-            'ta': 'Tamil',
-            'te': 'Telugu',
-            'bn': 'Bengali',
-            'mr': 'Marathi',
-            'gu': 'Gujarati',
-            'kn': 'Kannada',
-            'ml': 'Malayalam',
-            'pa': 'Punjabi',
-            'or': 'Odia',
-            'en': 'English'
-        }
-        
-        source_lang_name = lang_names.get(source_lang, source_lang)
-        
-        try:
-            if model_type == "openai":
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": f"You are a professional translator from {source_lang_name} to English. Translate the following text accurately, preserving all information."},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0.3,
-                    max_tokens=2000
-                )
-                return response.choices[0].message.content
-            
-            elif model_type == "gemini":
-                gemini_model = genai.GenerativeModel('gemini-pro')
-                response = gemini_model.generate_content([
-                    f"You are a professional translator from {source_lang_name} to English. Translate the following text accurately, preserving all information.",
-                    text
-                ])
-                return response.text
-                
-        except Exception as e:
-            print(f"Translation error: {str(e)}")
-            return text  # Return original text if translation fails
-    
+
+        return self._cached_translate("translate_en", text, source_lang, "en", selected_model)
+
     def translate_to_language(self, text, source_lang, target_lang, selected_model="OpenAI (GPT-3.5)"):
         """Translate text from source language to target language using selected AI model"""
         # If source and target are the same, return as is
         if source_lang == target_lang:
             return text
-            
-        client, model_type = self.model_manager.get_client(selected_model)
-        
-        # Map language codes to full names for better prompting
-        lang_names = {
-            'hi': 'Hindi',
-            'ta': 'Tamil',
-            'te': 'Telugu',
-            'bn': 'Bengali',
-            'mr': 'Marathi',
-            'gu': 'Gujarati',
-            'kn': 'Kannada',
-            'ml': 'Malayalam',
-            'pa': 'Punjabi',
-            'or': 'Odia',
-            'en': 'English'
-        }
-        
-        source_lang_name = lang_names.get(source_lang, source_lang)
-        target_lang_name = lang_names.get(target_lang, target_lang)
-        
+
+        return self._cached_translate("translate_target", text, source_lang, target_lang, selected_model)
+
+    def stream_translation(self, pieces, source_lang, target_lang, selected_model="OpenAI (GPT-3.5)", translate=None):
+        """Translate streamed text paragraph by paragraph, yielding translations in order as they finish"""
+        # Each paragraph goes through translate(text, source_lang, target_lang, selected_model);
+        # callers that apply their own provider limits pass it in
+        translate = translate or self.translate_to_language
+
+        # If source and target are the same, pass the stream through
+        if source_lang == target_lang:
+            yield from pieces
+            return
+
+        self.model_manager.get_client(selected_model)
+
+        # Finished paragraphs start translating while later ones are still being generated
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        in_flight = deque()
+        buffer = ""
+        try:
+            for piece in pieces:
+                buffer += piece
+                while "\n\n" in buffer:
+                    paragraph, buffer = buffer.split("\n\n", 1)
+                    if paragraph.strip():
+                        in_flight.append(pool.submit(
+                            bind_context(translate), paragraph, source_lang, target_lang, selected_model
+                        ))
+                # Yield translations that are already done, without waiting on the rest
+                while in_flight and in_flight[0].done():
+                    yield in_flight.popleft().result() + "\n\n"
+
+            if buffer.strip():
+                in_flight.append(pool.submit(
+                    bind_context(translate), buffer, source_lang, target_lang, selected_model
+                ))
+            while in_flight:
+                yield in_flight.popleft().result() + "\n\n"
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _cached_translate(self, stage, text, source_lang, target_lang, selected_model):
+        """Translate text, reusing a cached result for the same text, languages and model"""
+        # Fail early on an unknown model rather than reporting it as a translation error
+        self.model_manager.get_client(selected_model)
+
+        key = [self.cache.hash_content(text), source_lang, target_lang, selected_model]
+        cached = self.cache.get(stage, key)
+        if cached is not None:
+            print(f"Result cache hit: {stage}")
+            return cached
+
         try:
-            if model_type == "openai":
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[
-                        {"role": "system", "content": f"You are a professional translator from {source_lang_name} to {target_lang_name}. Translate the following text accurately, preserving all information."},
-                        {"role": "user", "content": text}
-                    ],
-                    temperature=0.3,
-                    max_tokens=2000
-                )
-                return response.choices[0].message.content
-            
-            elif model_type == "gemini":
-                gemini_model = genai.GenerativeModel('gemini-pro')
-                response = gemini_model.generate_content([
-                    f"You are a professional translator from {source_lang_name} to {target_lang_name}. Translate the following text accurately, preserving all information.",
-                    text
-                ])
-                return response.text
-                
+            with span("translate", source=source_lang, target=target_lang):
+                translated, complete = self._translate(text, source_lang, target_lang, selected_model)
         except Exception as e:
             print(f"Translation error: {str(e)}")
-            return text  # Return original text if translation fails
\ No newline at end of file
+            return text  # Return original text if translation fails
+
+        # Partial translations still go to the user but are not cached
+        if complete:
+            self.cache.set(stage, key, translated)
+        return translated
+
+    def _translate(self, text, source_lang, target_lang, selected_model):
+        """Translate text segment by segment in concurrent batches; returns (text, complete)"""
+        job = TranslationJob(self, text, source_lang, target_lang, selected_model)
+
+        pending = job.misses
+        batches = self._make_batches(pending, job.segments)
+
+        attempt = 0
+        while pending and attempt <= self.max_retries:
+            if attempt > 0:
+                # Retry only the failed segments, one per request
+                print(f"Retrying {len(pending)} failed translation segments (attempt {attempt})")
+                time.sleep(attempt)
+                batches = [[i] for i in pending]
+
+            failed = []
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                futures = [(batch, pool.submit(bind_context(self._translate_batch), job, batch)) for batch in batches]
+                # Results are collected in submission order so the text is reassembled in order
+                for batch, future in futures:
+                    try:
+                        failed.extend(future.result())
+                    except Exception as e:
+                        print(f"Translation batch error: {str(e)}")
+                        failed.extend(batch)
+
+            pending = failed
+            attempt += 1
+
+        return job.finish()
+
+    def _make_batches(self, indexes, segments):
+        """Group consecutive segments into batches under the batch token budget"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for i in indexes:
+            tokens = estimate_tokens(segments[i][0])
+            if current and current_tokens + tokens > self.batch_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _translate_batch(self, job, batch):
+        """Translate a batch of segments in one request; returns the indexes that failed"""
+        prompt, content = job.build_request(batch)
+        reply = self.model_manager.generate(job.selected_model, prompt, content, max_tokens=4000)
+        return job.apply_reply(batch, reply)
+
+class TranslationJob:
+    """One text being translated: its segments, what is already known and what still has to be sent"""
+
+    def __init__(self, translator, text, source_lang, target_lang, selected_model):
+        self.memory = translator.memory
+        self.selected_model = selected_model
+        self.source_lang_name = LANGUAGE_NAMES.get(source_lang, source_lang)
+        self.target_lang_name = LANGUAGE_NAMES.get(target_lang, target_lang)
+
+        self.segments = split_into_segments(text, translator.batch_tokens)
+        self.translations = [None] * len(self.segments)
+
+        # Segments without letters (numbering, punctuation, blank space) are kept as is
+        self.translatable = [i for i, (segment, _) in enumerate(self.segments) if any(ch.isalpha() for ch in segment)]
+
+        # Look segments up in the translation memory first; only misses go to the model,
+        # and a segment repeated within the text is translated once
+        self.keys = {
+            i: self.memory.make_key(self.segments[i][0], source_lang, target_lang, selected_model)
+            for i in self.translatable
+        }
+        remembered = self.memory.lookup(list(self.keys.values()))
+        first_with_key = {}
+        self.duplicates = {}
+        self.misses = []
+        for i in self.translatable:
+            key = self.keys[i]
+            if key in remembered:
+                self.translations[i] = remembered[key]
+            elif key in first_with_key:
+                self.duplicates[i] = first_with_key[key]
+            else:
+                first_with_key[key] = i
+                self.misses.append(i)
+        if remembered:
+            found = len(self.translatable) - len(self.misses) - len(self.duplicates)
+            print(f"Translation memory: {found} of {len(self.translatable)} segments found")
+
+    def build_request(self, batch):
+        """Return the (system prompt, content) for translating a batch of segments"""
+        texts = [self.segments[i][0].strip() for i in batch]
+        if len(texts) == 1:
+            prompt = TRANSLATION_PROMPT.format(source=self.source_lang_name, target=self.target_lang_name)
+            return prompt, texts[0]
+
+        prompt = BATCH_TRANSLATION_PROMPT.format(source=self.source_lang_name, target=self.target_lang_name)
+        return prompt, "\n".join(f"[[{n + 1}]]\n{text}" for n, text in enumerate(texts))
+
+    def apply_reply(self, batch, reply):
+        """Record the translations found in a reply; returns the indexes missing from it"""
+        if len(batch) == 1:
+            found = {1: reply.strip()} if reply.strip() else {}
+        else:
+            # re.split with a capture group alternates marker numbers and segment text
+            parts = _SEGMENT_MARKER.split(reply)
+            found = {}
+            for number, translation in zip(parts[1::2], parts[2::2]):
+                if translation.strip():
+                    found[int(number)] = translation.strip()
+
+        failed = []
+        for n, i in enumerate(batch):
+            if n + 1 in found:
+                self.translations[i] = found[n + 1]
+            else:
+                failed.append(i)
+        return failed
+
+    def finish(self):
+        """Save new translations to memory and reassemble the text; returns (text, complete)"""
+        # Write new translations back to memory before filling in repeats
+        self.memory.store({self.keys[i]: self.translations[i] for i in self.misses if self.translations[i] is not None})
+        for i, first in self.duplicates.items():
+            self.translations[i] = self.translations[first]
+
+        untranslated = [i for i in self.translatable if self.translations[i] is None]
+        if untranslated and len(untranslated) == len(self.translatable):
+            raise RuntimeError("every segment failed to translate")
+        if untranslated:
+            print(f"Warning: {len(untranslated)} segments could not be translated and were left as is")
+
+        # Keep the original leading whitespace and separators so the layout survives;
+        # untranslated segments are left in the source language
+        parts = []
+        for (segment, separator), translation in zip(self.segments, self.translations):
+            if translation is None:
+                parts.append(segment + separator)
+            else:
+                leading = segment[:len(segment) - len(segment.lstrip())]
+                parts.append(leading + translation + separator)
+        return "".join(parts), not untranslated
@@ -25,4 +25,136 @@ def load_gemini_api_key():
     if not api_key:
         raise ValueError("Gemini API key not found. Please add it to your .env file.")
     
-    return api_key
\ No newline at end of file
+    return api_key
+
+def estimate_tokens(text):
+    """Roughly estimate how many model tokens a text will use"""
+    # About four bytes per token holds for English; Indic scripts use three
+    # bytes per character and tokenise at roughly one token per character
+    return len(text.encode("utf-8")) // 4 + 1
+
+def _budget_cut(text, max_tokens):
+    """Return how many leading characters of text fit in max_tokens, cutting on a character boundary"""
+    # estimate_tokens allows just under four bytes per token; decoding the byte prefix
+    # drops a character split by the cut
+    budget = max(1, max_tokens * 4 - 1)
+    prefix = text[:budget].encode("utf-8")[:budget]
+    return max(1, len(prefix.decode("utf-8", "ignore")))
+
+def split_into_chunks(text, max_tokens):
+    """Split text into chunks under a token budget, breaking on section and paragraph boundaries"""
+    import re
+    
+    # Prefer blank-line paragraphs; PDF text often only has single newlines
+    if re.search(r'\n\s*\n', text):
+        paragraphs = re.split(r'\n\s*\n', text)
+        separator = "\n\n"
+    else:
+        paragraphs = text.split("\n")
+        separator = "\n"
+    
+    # Headings such as "ORDER", "1." or "IV." mark good places to start a new chunk
+    heading = re.compile(r'^\s*(\d+[\.\)]\s|[IVXLC]+\.\s|[A-Z][A-Z .:-]{3,}$)')
+    
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in paragraphs:
+        if not paragraph.strip():
+            continue
+        tokens = estimate_tokens(paragraph)
+        
+        # Paragraphs larger than the budget are split further on their own
+        if tokens > max_tokens:
+            if current:
+                chunks.append(separator.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_paragraph(paragraph, max_tokens))
+            continue
+        
+        at_section_break = heading.match(paragraph) and current_tokens > max_tokens // 2
+        if current and (current_tokens + tokens > max_tokens or at_section_break):
+            chunks.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += tokens
+    
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+def _split_long_paragraph(paragraph, max_tokens):
+    """Split an oversized paragraph on sentence ends, or hard-split if a sentence is still too long"""
+    import re
+    
+    sentences = re.split(r'(?<=[.!?।॥])\s+', paragraph)
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        while estimate_tokens(sentence) > max_tokens:
+            cut = _budget_cut(sentence, max_tokens)
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:]
+        candidate = f"{current} {sentence}" if current else sentence
+        if estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+# Abbreviations common in Indian legal text that end in a full stop without ending a sentence
+SEGMENT_ABBREVIATIONS = {
+    'sec', 'secs', 'no', 'nos', 'mr', 'mrs', 'ms', 'dr', 'smt', 'shri', 'sri', 'kum',
+    'vs', 'v', 'etc', 'ltd', 'pvt', 'co', 'art', 'arts', 'cl', 'hon', 'ors', 'anr',
+    'govt', 'dept', 'st', 'rs', 'viz', 'ie', 'eg', 'sr', 'jr', 'p', 'pp', 'para', 'r', 'o',
+}
+
+def split_into_segments(text, max_tokens=500):
+    """Split text into sentence segments as (segment, separator) pairs that rejoin to the original text"""
+    import re
+    
+    # Sentence ends include the danda and double danda used in most Indic scripts;
+    # blank lines always end a segment
+    boundary = re.compile(r'[.!?।॥]+["\'”’)\]]*(\s+)|\n\s*\n\s*')
+    
+    segments = []
+    start = 0
+    for match in boundary.finditer(text):
+        if match.group(1) is not None:
+            separator_start = match.start(1)
+            # Skip full stops after abbreviations, initials and list numbers
+            if text[separator_start - 1] == '.':
+                word = re.search(r'(\w+)\W*$', text[start:separator_start])
+                if word and (word.group(1).lower() in SEGMENT_ABBREVIATIONS or len(word.group(1)) == 1
+                             or word.group(1).isdigit()):
+                    continue
+        else:
+            separator_start = match.start()
+        segments.append((text[start:separator_start], text[separator_start:match.end()]))
+        start = match.end()
+    if start < len(text):
+        segments.append((text[start:], ""))
+    
+    # Break up segments that are still over budget, first on line breaks, then by length
+    result = []
+    for segment, separator in segments:
+        if estimate_tokens(segment) <= max_tokens:
+            result.append((segment, separator))
+            continue
+        lines = segment.split("\n")
+        pieces = []
+        for i, line in enumerate(lines):
+            line_separator = "\n" if i < len(lines) - 1 else separator
+            while estimate_tokens(line) > max_tokens:
+                cut = _budget_cut(line, max_tokens)
+                pieces.append((line[:cut], ""))
+                line = line[cut:]
+            pieces.append((line, line_separator))
+        result.extend(pieces)
+    return result